@@ -1,4 +1,7 @@
 # ai_suggestions.py
+import numpy as np
+import pandas as pd
+
 def make_recommendations(schedule_df, forecast_df, village_name="1"):
     recs = []
     # key stats
@@ -34,3 +37,123 @@ def make_recommendations(schedule_df, forecast_df, village_name="1"):
     # 5) Short tactical suggestions
     recs.append("Operational tips: (1) Shift high-energy deferrable loads (pumps, EV charging) to daytime solar peak. (2) Keep battery SOC >= 30% overnight if possible. (3) Log any outages and re-run forecast.")
     return recs
+
+SOC_ALERT = 0.25
+IMPORT_ALERT = 0.5
+DEFICIT_RATIO = 1.2
+OPERATIONAL_TIPS = ("Operational tips: (1) Shift high-energy deferrable loads (pumps, EV charging) to daytime "
+                    "solar peak. (2) Keep battery SOC >= 30% overnight if possible. (3) Log any outages and "
+                    "re-run forecast.")
+ALERT_COLUMNS = ['rank', 'village', 'priority', 'kind', 'message']
+PRIORITY = {'low_soc': 3, 'high_import': 2, 'discharge': 1, 'charge_window': 0, 'no_surplus': 0,
+            'sharing': 0}
+
+def _long(frames, columns):
+    # {village: frame} -> one long frame of `columns` plus village; long frames pass through
+    if isinstance(frames, pd.DataFrame):
+        return frames
+    parts = list(frames.values())
+    cols = {c: np.concatenate([f[c].to_numpy() for f in parts]) for c in columns
+            if parts and all(c in f.columns for f in parts)}
+    cols['village'] = np.repeat(np.array([str(v) for v in frames], dtype=object), [len(f) for f in parts])
+    return pd.DataFrame(cols)
+
+def _groups(frame):
+    # row order that groups villages by first appearance but keeps each village's own row order
+    codes, villages = pd.factorize(frame['village'].astype(str))
+    order = np.argsort(codes, kind='stable')
+    sorted_codes = codes[order]
+    starts = np.flatnonzero(np.r_[True, sorted_codes[1:] != sorted_codes[:-1]])
+    return pd.Index(villages, name='village'), order, starts
+
+def _first_last(mask, starts):
+    # first / last position of True in each group, -1 where a group has none
+    n = len(mask)
+    pos = np.arange(n)
+    first = np.minimum.reduceat(np.where(mask, pos, n), starts)
+    last = np.maximum.reduceat(np.where(mask, pos, -1), starts)
+    return np.where(first < n, first, -1), last
+
+def fleet_summary(schedules, forecasts):
+    """Per-village inputs of make_recommendations for a whole fleet in one grouped pass.
+
+    `schedules` and `forecasts` are long frames with a village column or {village: frame}
+    dicts; rows keep their order within each village, as the single-village function
+    reads them. Returns final_soc, avg_import, received, surplus_start, surplus_end and
+    deficit_onset (NaT when absent) indexed by village.
+    """
+    sched = _long(schedules, ['battery_soc', 'net_import_kw', 'received_from_pool'])
+    fc = _long(forecasts, ['timestamp', 'demand', 'solar'])
+    if sched.empty or fc.empty:
+        return pd.DataFrame(columns=['final_soc', 'avg_import', 'received', 'surplus_start',
+                                     'surplus_end', 'deficit_onset'])
+    villages, order, starts = _groups(sched)
+    ends = np.r_[starts[1:], len(order)] - 1
+    soc = sched['battery_soc'].to_numpy(dtype=float)[order]
+    imp = sched['net_import_kw'].to_numpy(dtype=float)[order]
+    out = pd.DataFrame({'final_soc': soc[ends],
+                        'avg_import': np.add.reduceat(imp, starts) / np.diff(np.r_[starts, len(order)])},
+                       index=villages)
+    received = (sched['received_from_pool'].to_numpy(dtype=float)[order]
+                if 'received_from_pool' in sched.columns else np.zeros(len(order)))
+    out['received'] = np.add.reduceat(received, starts)
+    f_villages, f_order, f_starts = _groups(fc)
+    demand = fc['demand'].to_numpy(dtype=float)[f_order]
+    solar = fc['solar'].to_numpy(dtype=float)[f_order]
+    ts = pd.DatetimeIndex(fc['timestamp'].to_numpy()[f_order])
+    s_first, s_last = _first_last(solar - demand > 0, f_starts)
+    d_first, _ = _first_last(demand > solar * DEFICIT_RATIO, f_starts)
+    windows = pd.DataFrame({name: ts[idx].where(idx >= 0) for name, idx in
+                            (('surplus_start', s_first), ('surplus_end', s_last), ('deficit_onset', d_first))},
+                           index=f_villages)
+    return out.join(windows)
+
+def fleet_recommendations(schedules, forecasts, top_n=None):
+    """Ranked alert table for the fleet with the same advice as make_recommendations.
+
+    One row per (village, kind), most critical villages first: low final SOC (lowest
+    first), then high average import (highest first), then the rest. `top_n` keeps the
+    N most critical villages. The fleet-wide operational tips appear once, last.
+    """
+    summary = fleet_summary(schedules, forecasts)
+    fmt = lambda t: t.strftime('%Y-%m-%d %H:%M')
+    rows = []
+    for v, r in zip(summary.index, summary.itertuples(index=False)):
+        if r.final_soc < SOC_ALERT:
+            rows.append((v, 'low_soc', f"Village {v}: ALERT — battery SOC may drop to {r.final_soc*100:.0f}%. "
+                                       "Prioritize critical loads (hospital, water pumps)."))
+        if r.avg_import > IMPORT_ALERT:
+            rows.append((v, 'high_import', f"Village {v}: Expected average import {r.avg_import:.2f} kW — consider "
+                                           "adding storage or reducing non-critical demand windows."))
+        if pd.notna(r.surplus_start):
+            rows.append((v, 'charge_window', f"Village {v}: Charge recommendation — schedule battery charging between "
+                                             f"{fmt(r.surplus_start)} and {fmt(r.surplus_end)} when solar surplus exists."))
+        else:
+            rows.append((v, 'no_surplus', f"Village {v}: No daytime solar surplus expected — avoid deep discharge; "
+                                          "schedule non-critical tasks when predicted solar rises (≈midday)."))
+        if pd.notna(r.deficit_onset):
+            rows.append((v, 'discharge', f"Village {v}: Discharge when deficit begins (around {fmt(r.deficit_onset)}) "
+                                         "to protect critical services; avoid discharging below 20% SOC."))
+        if r.received > 0:
+            rows.append((v, 'sharing', f"Village {v}: This village will receive shared energy from neighbors during "
+                                       "some timesteps — coordinate transfers and notify operators."))
+    alerts = pd.DataFrame(rows, columns=['village', 'kind', 'message']).drop_duplicates(['village', 'kind'])
+    alerts['priority'] = alerts['kind'].map(PRIORITY)
+    # village criticality: low SOC alert by how low, then import by how high
+    low = summary['final_soc'] < SOC_ALERT
+    crit = pd.DataFrame({'low': low, 'soc': summary['final_soc'].where(low, 0.0), 'imp': summary['avg_import']})
+    ranked = crit.sort_values(['low', 'soc', 'imp'], ascending=[False, True, False], kind='stable')
+    village_rank = pd.Series(np.arange(1, len(ranked) + 1), index=ranked.index)
+    alerts['rank'] = alerts['village'].map(village_rank)
+    alerts = alerts.sort_values(['rank', 'priority'], ascending=[True, False], kind='stable')
+    if top_n is not None:
+        alerts = alerts[alerts['rank'] <= top_n]
+    tips = pd.DataFrame([{'rank': len(ranked) + 1, 'village': None, 'priority': 0, 'kind': 'tips',
+                          'message': OPERATIONAL_TIPS}])
+    return pd.concat([alerts, tips], ignore_index=True)[ALERT_COLUMNS]
+
+def alert_page(alerts, page=0, page_size=25):
+    """(rows of page `page`, number of pages) for paging an alert table in the dashboard."""
+    pages = max(1, -(-len(alerts) // page_size))
+    page = min(max(0, page), pages - 1)
+    return alerts.iloc[page * page_size:(page + 1) * page_size], pages
@@ -1,10 +1,21 @@
 from ai_chatbot import ai_chatbot
+import functools
+import os
 import streamlit as st
 import pandas as pd
-import requests
+from power_api import fetch_power_frame
+from model_registry import train_or_load_registry
+from forecast import forecast_horizon_recursive
+from simulator import simulate_multi_village_vectorized
+from ai_suggestions import alert_page, fleet_recommendations, make_recommendations
+from visualization import MAX_POINTS, plot_fleet_timeseries, plot_village_timeseries
+from datastore import STORE_DIR, VALUE_COLUMNS, load_store, source_fingerprint
+import profiling
+from profiling import stage
 from streamlit_js_eval import get_geolocation
 from geopy.geocoders import Nominatim
 from datetime import datetime, timedelta
+import json
 import plotly.express as px
 
 # -----------------------------------
@@ -15,11 +26,97 @@ st.set_page_config(page_title="EnerShift Simulator", layout="wide")
 st.title("⚡ EnerShift – Smart Rural Energy Simulator ⚡")
 st.caption("NASA POWER API • AI-Powered Analytics • Real-time Optimization")
 
+DATA_FILE = "enershift_data.csv"
+
+# -----------------------------------
+# Cached stages: keyed by their inputs, so a rerun only recomputes what changed
+# -----------------------------------
+@st.cache_resource
+def cache_stats():
+    # name -> [calls, misses], shared by all reruns and sessions
+    return {}
+
+def cached(name, resource=False, **cache_kwargs):
+    """st.cache_data (or st.cache_resource) with hit/miss counting under `name`."""
+    def wrap(fn):
+        @functools.wraps(fn)
+        def miss(*args, **kwargs):
+            cache_stats()[name][1] += 1
+            return fn(*args, **kwargs)
+        store = (st.cache_resource if resource else st.cache_data)(show_spinner=False, **cache_kwargs)(miss)
+
+        @functools.wraps(fn)
+        def call(*args, **kwargs):
+            cache_stats().setdefault(name, [0, 0])[0] += 1
+            return store(*args, **kwargs)
+        return call
+    return wrap
+
+@cached("geocode", max_entries=256, ttl=24 * 3600)
+def reverse_geocode(lat, lon):
+    with stage("geocode"):
+        return Nominatim(user_agent="enershift_app").reverse(f"{lat}, {lon}", language="en").address
+
+@cached("weather", max_entries=64, ttl=6 * 3600)
+def weather_frame(lat, lon, start, end):
+    # failures raise and are not cached, so the next rerun retries
+    with stage("power.fetch"):
+        return fetch_power_frame(lat, lon, start, end)
+
+@cached("figures", max_entries=32)
+def availability_figures(df):
+    figs = []
+    for col, color, title, unit in (("solar", "orange", "Solar Radiation (kWh/m²)", "kWh/m²"),
+                                    ("wind", "blue", "Wind Speed (m/s)", "m/s")):
+        fig = px.line(df, x="date", y=col, markers=True, title=title,
+                      labels={col: unit, "date": "Date"}, line_shape="linear")
+        fig.update_traces(line=dict(color=color, width=3))
+        fig.update_layout(xaxis=dict(tickformat="%d-%b", tickangle=-45), template="plotly_dark", height=400)
+        figs.append(fig)
+    return figs
+
+@cached("history", max_entries=4)
+def load_history(path, mtime):
+    # `mtime` is part of the key so an edited CSV is picked up
+    hist = pd.read_csv(path, parse_dates=["DATE_TIME"]).rename(columns={"DATE_TIME": "timestamp"})
+    if "village" not in hist.columns:
+        hist["village"] = "1"
+    return hist
+
+@cached("models", resource=True, max_entries=4)
+def load_models(path, mtime):
+    return train_or_load_registry(load_history(path, mtime), workers=1)
+
+@cached("forecasts", max_entries=32, ttl=3600)
+def village_forecasts(path, mtime, horizon_hours):
+    hist = load_history(path, mtime)
+    models = load_models(path, mtime)
+    return forecast_horizon_recursive(hist, models, list(models), horizon_hours=horizon_hours)
+
+@cached("store index", max_entries=4)
+def store_index(root, fingerprint):
+    idx = load_store(root, columns=[])
+    return sorted(idx['village'].cat.categories), idx['timestamp'].min(), idx['timestamp'].max()
+
+@cached("store window", max_entries=32, ttl=600)
+def store_window(root, fingerprint, villages, start, end, column):
+    # only the partitions and row groups overlapping the window are read
+    return load_store(root, villages=list(villages), start=start, end=end, columns=[column])
+
+@cached("schedules", max_entries=128, ttl=3600)
+def village_schedules(path, mtime, horizon_hours, battery_kwh, battery_pmax_kw, min_soc_frac):
+    return simulate_multi_village_vectorized(village_forecasts(path, mtime, horizon_hours),
+                                             battery_kwh=battery_kwh, battery_pmax_kw=battery_pmax_kw,
+                                             min_soc_frac=min_soc_frac)
+
 # -----------------------------------
 # Sidebar navigation
 # -----------------------------------
-menu = ["Battery Status", "AI Chatbot"]
+menu = ["Battery Status", "Forecast & Dispatch", "Fleet History", "AI Chatbot"]
 choice = st.sidebar.radio("📌 Select Feature", menu)
+# stages of this session's rerun only: the collector belongs to the script thread, so
+# other sessions (and the process-wide ENERSHIFT_PROFILE collector) are untouched
+run_profile = profiling.begin(st.sidebar.toggle("🩺 Profile this run", value=profiling.ENABLED))
 
 # -----------------------------------
 # Step 1: Detect Location
@@ -29,10 +126,9 @@ st.subheader("📍 Location Detection")
 loc = get_geolocation()
 
 if loc:
-    lat, lon = loc['coords']['latitude'], loc['coords']['longitude']
-    geolocator = Nominatim(user_agent="enershift_app")
-    location = geolocator.reverse(f"{lat}, {lon}", language="en")
-    st.success(f"Detected Location: {location.address}")
+    # ~10 m rounding so GPS jitter between reruns still hits the cache
+    lat, lon = round(loc['coords']['latitude'], 4), round(loc['coords']['longitude'], 4)
+    st.success(f"Detected Location: {reverse_geocode(lat, lon)}")
 else:
     st.warning("Could not fetch location. Defaulting to Chennai, India")
     lat, lon = 13.0827, 80.2707
@@ -44,28 +140,12 @@ else:
 end_date = datetime.today().strftime("%Y%m%d")
 start_date = (datetime.today() - timedelta(days=7)).strftime("%Y%m%d")
 
-url = (
-    f"https://power.larc.nasa.gov/api/temporal/daily/point"
-    f"?parameters=ALLSKY_SFC_SW_DWN,WS10M"
-    f"&community=RE&longitude={lon}&latitude={lat}"
-    f"&start={start_date}&end={end_date}&format=JSON"
-)
-
-response = requests.get(url)
-
+# served from the on-disk/in-process POWER cache (or recorded responses when
+# ENERSHIFT_POWER_OFFLINE points at a recordings directory)
 df = None
-if response.status_code == 200:
-    data = response.json()
-    solar = data["properties"]["parameter"]["ALLSKY_SFC_SW_DWN"]
-    wind = data["properties"]["parameter"]["WS10M"]
-
-    df = pd.DataFrame({
-        "date": list(solar.keys()),
-        "solar": list(solar.values()),
-        "wind": list(wind.values())
-    })
-    df["date"] = pd.to_datetime(df["date"])
-else:
+try:
+    df = weather_frame(lat, lon, start_date, end_date)
+except Exception:
     st.error("❌ Failed to fetch NASA POWER data. Please try again.")
 
 # -----------------------------------
@@ -145,46 +225,66 @@ if choice == "Battery Status":
 
     # Show graphs only if NASA data available
     if df is not None:
+        fig_solar, fig_wind = availability_figures(df)
         col1, col2 = st.columns(2)
-
         with col1:
             st.markdown("### ☀️ Solar Availability")
-            fig_solar = px.line(
-                df,
-                x="date",
-                y="solar",
-                markers=True,
-                title="Solar Radiation (kWh/m²)",
-                labels={"solar": "kWh/m²", "date": "Date"},
-                line_shape="linear"
-            )
-            fig_solar.update_traces(line=dict(color="orange", width=3))
-            fig_solar.update_layout(
-                xaxis=dict(tickformat="%d-%b", tickangle=-45),
-                template="plotly_dark",
-                height=400
-            )
             st.plotly_chart(fig_solar, use_container_width=True)
-
         with col2:
             st.markdown("### 🌬️ Wind Availability")
-            fig_wind = px.line(
-                df,
-                x="date",
-                y="wind",
-                markers=True,
-                title="Wind Speed (m/s)",
-                labels={"wind": "m/s", "date": "Date"},
-                line_shape="linear"
-            )
-            fig_wind.update_traces(line=dict(color="blue", width=3))
-            fig_wind.update_layout(
-                xaxis=dict(tickformat="%d-%b", tickangle=-45),
-                template="plotly_dark",
-                height=400
-            )
             st.plotly_chart(fig_wind, use_container_width=True)
 
+elif choice == "Forecast & Dispatch":
+    st.header("📈 Forecast & Dispatch")
+    c1, c2, c3, c4 = st.columns(4)
+    horizon = c1.slider("Horizon (hours)", min_value=6, max_value=72, value=24, step=6)
+    battery_kwh = c2.number_input("Battery (kWh)", min_value=10, max_value=1000, value=100, step=10)
+    battery_pmax_kw = c3.number_input("Battery power (kW)", min_value=5, max_value=500, value=50, step=5)
+    min_soc_frac = c4.slider("Minimum SOC", min_value=0.0, max_value=0.5, value=0.2, step=0.05)
+    mtime = os.path.getmtime(DATA_FILE)
+    with st.spinner("Forecasting and dispatching..."):
+        forecasts = village_forecasts(DATA_FILE, mtime, horizon)
+        schedules = village_schedules(DATA_FILE, mtime, horizon, battery_kwh, battery_pmax_kw, min_soc_frac)
+    village = st.selectbox("Village", list(schedules))
+    st.plotly_chart(plot_village_timeseries(schedules[village], title=f"Village {village}"),
+                    use_container_width=True)
+    st.subheader("🤖 Recommendations")
+    for rec in make_recommendations(schedules[village], forecasts[village], village_name=village):
+        st.info(rec)
+    st.subheader("🚨 Fleet alerts")
+    alerts = fleet_recommendations(schedules, forecasts)
+    p1, p2 = st.columns([1, 3])
+    page_size = p1.selectbox("Rows per page", [10, 25, 50, 100], index=1)
+    _, pages = alert_page(alerts, 0, page_size)
+    page = p2.number_input(f"Page (of {pages})", min_value=1, max_value=pages, value=1) - 1
+    st.dataframe(alert_page(alerts, page, page_size)[0], hide_index=True, use_container_width=True)
+
+elif choice == "Fleet History":
+    st.header("🗂️ Fleet History")
+    if not os.path.isdir(STORE_DIR):
+        st.info(f"No data store at `{STORE_DIR}` yet. Build one with merge_dataset.stream_merge "
+                "or datastore.csv_to_store.")
+    else:
+        # sizes and mtimes of every partition file: appends inside a village=/month=
+        # subdirectory do not touch the store root's own mtime
+        fingerprint = source_fingerprint(STORE_DIR)
+        all_villages, first, last = store_index(STORE_DIR, fingerprint)
+        c1, c2 = st.columns([3, 1])
+        villages = c1.multiselect("Villages", all_villages, default=all_villages[:10])
+        column = c2.selectbox("Series", VALUE_COLUMNS, index=VALUE_COLUMNS.index("demand"))
+        # the chart carries at most MAX_POINTS per village; narrowing the window re-reads
+        # just that range from the store, so detail comes back as you zoom in
+        start, end = st.slider("Window", min_value=first.to_pydatetime(), max_value=last.to_pydatetime(),
+                               value=(first.to_pydatetime(), last.to_pydatetime()), format="YYYY-MM-DD HH:mm")
+        if villages:
+            window = store_window(STORE_DIR, fingerprint, tuple(villages), start, end + timedelta(seconds=1), column)
+            st.plotly_chart(plot_fleet_timeseries(window, column=column, title=f"{column} by village"),
+                            use_container_width=True)
+            st.caption(f"{len(window):,} readings in the window, drawn with at most {MAX_POINTS} "
+                       "points per village")
+        else:
+            st.info("Select at least one village.")
+
 elif choice == "AI Chatbot":
     battery_data, forecast_data = battery_status()
 
@@ -218,3 +318,34 @@ elif choice == "AI Chatbot":
         if st.button("Get Answer"):
             st.subheader("💡 Answer")
             st.info(questions[selected_q])
+
+# -----------------------------------
+# Sidebar cache statistics
+# -----------------------------------
+with st.sidebar.expander("⚡ Cache"):
+    stats = cache_stats()
+    if stats:
+        st.dataframe(pd.DataFrame([{'stage': k, 'calls': c, 'hits': c - m, 'misses': m}
+                                   for k, (c, m) in stats.items()]), hide_index=True)
+    if st.button("Clear caches"):
+        # models and the counters live in cache_resource, so both caches start over
+        st.cache_data.clear()
+        st.cache_resource.clear()
+        st.rerun()
+
+# -----------------------------------
+# Sidebar diagnostics (stage timings of this run)
+# -----------------------------------
+if run_profile is not None:
+    diag = profiling.report(run_profile)
+    with st.sidebar.expander("🩺 Diagnostics", expanded=True):
+        if diag['stages']:
+            st.dataframe(pd.DataFrame(diag['stages'])[['stage', 'calls', 'total_s', 'max_s', 'rows_per_s']],
+                         hide_index=True)
+        else:
+            st.caption("No instrumented stage ran in this rerun.")
+        for name, n in diag['counters'].items():
+            st.caption(f"{name}: {n}")
+        st.download_button("Download report (JSON)", json.dumps(diag, indent=2, default=str),
+                           file_name="enershift_profile.json", mime="application/json")
+profiling.end()
@@ -0,0 +1,69 @@
+# benchmarks/bench_compact.py
+import argparse
+import multiprocessing as mp
+import os
+import resource
+import shutil
+import tempfile
+import time
+import joblib
+import numpy as np
+import pandas as pd
+from compact_forest import CompactModelStore, export_models
+from forecast import FEATURES, _make_features, fit_village
+from benchmarks.synthetic import fleet_forecasts
+
+def _rss_mb():
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024.0
+
+def _load_and_predict(kind, path, villages, X, queue):
+    # runs in a fresh process so load time and peak RSS are not polluted by the parent
+    base = _rss_mb()
+    t0 = time.perf_counter()
+    models = joblib.load(path) if kind == "joblib" else CompactModelStore(path)
+    t_load = time.perf_counter() - t0
+    t0 = time.perf_counter()
+    for v in villages:
+        models[v]['demand'].predict(X)
+    t_pred = time.perf_counter() - t0
+    queue.put((t_load, t_pred, _rss_mb() - base))
+
+def _measure(kind, path, villages, X):
+    ctx = mp.get_context("spawn")
+    q = ctx.Queue()
+    p = ctx.Process(target=_load_and_predict, args=(kind, path, villages, X, q))
+    p.start()
+    out = q.get()
+    p.join()
+    return out
+
+if __name__ == "__main__":
+    ap = argparse.ArgumentParser(description="joblib vs memory-mapped compact forest loading")
+    ap.add_argument("--villages", type=int, default=20)
+    ap.add_argument("--steps", type=int, default=24 * 30)
+    ap.add_argument("--query", type=int, default=3, help="villages forecast after loading")
+    args = ap.parse_args()
+    df = pd.concat(fleet_forecasts(args.villages, args.steps).values(), ignore_index=True)
+    t0 = time.perf_counter()
+    models = {v: fit_village(g) for v, g in df.groupby('village')}
+    print(f"trained {args.villages} villages in {time.perf_counter() - t0:.1f}s")
+    tmp = tempfile.mkdtemp()
+    try:
+        jpath = os.path.join(tmp, "models.joblib")
+        joblib.dump(models, jpath)
+        cpath = os.path.join(tmp, "compact")
+        export_models(models, cpath)
+        villages = list(models)[:args.query]
+        g = _make_features(df[df.village == villages[0]].reset_index(drop=True))
+        X = g[FEATURES].fillna(0).iloc[:24]
+        err = max(float(np.abs(models[v]['demand'].predict(X) -
+                               CompactModelStore(cpath)[v]['demand'].predict(X)).max()) for v in villages)
+        print(f"max abs prediction diff vs sklearn: {err:.2e}")
+        size_c = sum(os.path.getsize(os.path.join(d, f)) for d, _, fs in os.walk(cpath) for f in fs)
+        print(f"artifact size: joblib {os.path.getsize(jpath) / 1e6:.1f} MB, compact {size_c / 1e6:.1f} MB")
+        for kind, path in (("joblib", jpath), ("compact", cpath)):
+            t_load, t_pred, rss = _measure(kind, path, villages, X)
+            print(f"{kind:8s} load {t_load * 1000:8.1f} ms  predict {args.query} villages "
+                  f"{t_pred * 1000:7.1f} ms  peak RSS +{rss:.0f} MB")
+    finally:
+        shutil.rmtree(tmp)
@@ -0,0 +1,69 @@
+# benchmarks/bench_global.py
+import argparse
+import io
+import time
+import joblib
+import pandas as pd
+from forecast import (fit_global, fit_village, forecast_horizon, forecast_horizon_global,
+                      forecast_horizon_recursive)
+from benchmarks.synthetic import fleet_frame
+
+def artifact_mb(obj):
+    buf = io.BytesIO()
+    joblib.dump(obj, buf)
+    return buf.tell() / 1e6
+
+def wape(pred, actual, villages, column):
+    # weighted absolute percentage error over the given villages
+    p = pred.set_index(['village', 'timestamp'])[column]
+    a = actual.set_index(['village', 'timestamp'])[column]
+    a = a[a.index.get_level_values(0).isin(villages)]
+    return float((p.reindex(a.index) - a).abs().sum() / max(a.abs().sum(), 1e-9))
+
+if __name__ == "__main__":
+    ap = argparse.ArgumentParser(description="Global pooled model vs per-village forests")
+    ap.add_argument("--villages", type=int, default=30)
+    ap.add_argument("--days", type=int, default=60)
+    ap.add_argument("--sparse", type=int, default=6, help="villages that only have --sparse-rows of history")
+    ap.add_argument("--sparse-rows", type=int, default=30)
+    ap.add_argument("--horizon", type=int, default=24)
+    args = ap.parse_args()
+    df = fleet_frame(args.villages, args.days * 24, seed=7)
+    cutoff = df['timestamp'].max() - pd.Timedelta(hours=args.horizon - 1)
+    train, actual = df[df['timestamp'] < cutoff], df[df['timestamp'] >= cutoff]
+    villages = sorted(df['village'].unique(), key=int)
+    sparse = villages[:args.sparse]
+    # sparse villages keep only their most recent rows, like newly connected sites
+    train = pd.concat([train[~train['village'].isin(sparse)],
+                       train[train['village'].isin(sparse)].groupby('village').tail(args.sparse_rows)])
+    established = villages[args.sparse:]
+    print(f"{args.villages} villages ({args.sparse} with {args.sparse_rows} rows), "
+          f"{len(train):,} training rows, {args.horizon}h holdout")
+
+    t0 = time.perf_counter()
+    per_village = {v: fit_village(g) for v, g in train.groupby('village')}
+    t_fit_local = time.perf_counter() - t0
+    t0 = time.perf_counter()
+    pooled = fit_global(train)
+    t_fit_global = time.perf_counter() - t0
+    n_forests = sum((m.get('demand') is not None) + (m.get('solar') is not None) for m in per_village.values())
+
+    t0 = time.perf_counter()
+    pred_local = pd.concat(forecast_horizon(train, per_village, villages, args.horizon).values())
+    t_pred_local = time.perf_counter() - t0
+    t0 = time.perf_counter()
+    pred_rec = forecast_horizon_recursive(train, per_village, villages, args.horizon, long=True)
+    t_pred_rec = time.perf_counter() - t0
+    t0 = time.perf_counter()
+    pred_global = forecast_horizon_global(train, pooled, villages, args.horizon, long=True)
+    t_pred_global = time.perf_counter() - t0
+
+    print(f"{'':<26}{'train s':>9}{'models':>8}{'size MB':>9}{'predict s':>11}"
+          f"{'demand WAPE est/new':>22}{'solar WAPE est/new':>21}")
+    rows = [("per-village, direct", t_fit_local, n_forests, artifact_mb(per_village), t_pred_local, pred_local),
+            ("per-village, recursive", t_fit_local, n_forests, artifact_mb(per_village), t_pred_rec, pred_rec),
+            ("global pooled", t_fit_global, 1, artifact_mb(pooled), t_pred_global, pred_global)]
+    for name, t_fit, count, size, t_pred, pred in rows:
+        acc = [wape(pred, actual, vs, col) for col in ('demand', 'solar') for vs in (established, sparse)]
+        print(f"{name:<26}{t_fit:9.2f}{count:8d}{size:9.1f}{t_pred:11.3f}"
+              f"{acc[0]:13.3f} /{acc[1]:6.3f}{acc[2]:13.3f} /{acc[3]:6.3f}")
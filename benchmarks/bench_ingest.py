@@ -0,0 +1,43 @@
+# benchmarks/bench_ingest.py
+import argparse
+import time
+import pandas as pd
+import requests
+from power_api import make_query
+from weather_ingest import ingest_sites
+from benchmarks.stub_power import start_stub_server
+
+def serial_ingest(sites, start, end, url):
+    # the app.py approach: one blocking request per site
+    out = {}
+    for row in sites.itertuples(index=False):
+        resp = requests.get(url, params=dict(make_query(row.lat, row.lon, start, end), format="JSON"))
+        out[row.village] = resp.json()
+    return out
+
+if __name__ == "__main__":
+    ap = argparse.ArgumentParser(description="Concurrent vs serial POWER ingestion against a local stub")
+    ap.add_argument("--sites", type=int, default=500)
+    ap.add_argument("--latency", type=float, default=0.05)
+    ap.add_argument("--concurrency", type=int, default=50)
+    args = ap.parse_args()
+    sites = pd.DataFrame({"village": [f"v{i}" for i in range(args.sites)],
+                          "lat": [8 + (i % 100) * 0.1 for i in range(args.sites)],
+                          "lon": [76 + (i // 100) * 0.1 for i in range(args.sites)]})
+    url, stop = start_stub_server(args.latency, fail_every=25)
+    try:
+        t0 = time.perf_counter()
+        frame = ingest_sites(sites, "20250101", "20250107", url=url,
+                             concurrency=args.concurrency, backoff=0.05)
+        t_async = time.perf_counter() - t0
+        print(f"async: {args.sites} sites in {t_async:.2f}s ({len(frame)} rows, every 25th call fails once)")
+    finally:
+        stop()
+    url, stop = start_stub_server(args.latency)
+    try:
+        t0 = time.perf_counter()
+        serial_ingest(sites, "20250101", "20250107", url)
+        t_serial = time.perf_counter() - t0
+        print(f"serial: {args.sites} sites in {t_serial:.2f}s -> speedup {t_serial / t_async:.1f}x")
+    finally:
+        stop()
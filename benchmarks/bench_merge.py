@@ -0,0 +1,29 @@
+# benchmarks/bench_merge.py
+import argparse
+import os
+import resource
+import shutil
+import tempfile
+import time
+from merge_dataset import stream_merge
+from benchmarks.synthetic import write_plant_csvs
+
+if __name__ == "__main__":
+    ap = argparse.ArgumentParser(description="Streaming merge throughput and peak memory")
+    ap.add_argument("--days", type=int, default=365, help="about 0.15 GB of CSV per 1,000 days at 22 inverters; 20000 gives ~3 GB")
+    ap.add_argument("--chunksize", type=int, default=500_000)
+    args = ap.parse_args()
+    tmp = tempfile.mkdtemp()
+    try:
+        gen_path, weather_path = write_plant_csvs(tmp, args.days)
+        size = os.path.getsize(gen_path) + os.path.getsize(weather_path)
+        base = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024.0
+        t0 = time.perf_counter()
+        rows = stream_merge(gen_path, weather_path, os.path.join(tmp, "out"), chunksize=args.chunksize,
+                            date_format="%Y-%m-%d %H:%M:%S")
+        elapsed = time.perf_counter() - t0
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024.0
+        print(f"input {size / 1e9:.2f} GB, {rows} plant rows in {elapsed:.1f}s "
+              f"({rows / elapsed / 1e6:.2f}M rows/s), peak RSS {peak:.0f} MB (+{peak - base:.0f} MB)")
+    finally:
+        shutil.rmtree(tmp)
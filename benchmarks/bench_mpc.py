@@ -0,0 +1,49 @@
+# benchmarks/bench_mpc.py
+import argparse
+import time
+from optimizer import MPC_FLEET_COMMIT, optimize_fleet_mpc, optimize_storage_mpc, optimize_storage_vectorized
+from benchmarks.synthetic import fleet_forecasts
+
+if __name__ == "__main__":
+    ap = argparse.ArgumentParser(description="Receding-horizon LP dispatch throughput and quality")
+    ap.add_argument("--villages", type=int, default=3)
+    ap.add_argument("--steps", type=int, default=24 * 7)
+    ap.add_argument("--commit", type=int, default=1)
+    ap.add_argument("--fleet", type=int, default=64, help="villages for the fleet throughput run (0 skips it)")
+    args = ap.parse_args()
+    forecasts = fleet_forecasts(args.villages, args.steps)
+    for horizon in (24, 48):
+        solves = 0
+        elapsed = 0.0
+        mpc_import = greedy_import = mpc_unserved = greedy_unserved = 0.0
+        for f in forecasts.values():
+            t0 = time.perf_counter()
+            mpc = optimize_storage_mpc(f, horizon_steps=horizon, commit_steps=args.commit)
+            elapsed += time.perf_counter() - t0
+            solves += -(-len(f) // args.commit)
+            greedy = optimize_storage_vectorized(f)
+            critical = f['demand'].to_numpy() * 0.25
+            mpc_import += mpc['net_import_kw'].sum()
+            greedy_import += greedy['net_import_kw'].sum()
+            mpc_unserved += (critical - mpc['served_critical_kw']).clip(lower=0).sum()
+            greedy_unserved += (critical - greedy['served_critical_kw']).clip(lower=0).sum()
+        print(f"horizon {horizon:2d}h: {solves / elapsed:6.1f} solves/s per village "
+              f"({elapsed / solves * 1000:.1f} ms/solve) | "
+              f"import {mpc_import:.0f} vs greedy {greedy_import:.0f} kWh, "
+              f"critical on grid {mpc_unserved:.0f} vs {greedy_unserved:.0f} kWh")
+    if args.fleet:
+        # whole fleet through optimize_fleet_mpc: block-diagonal LPs, per-village loop as reference
+        fleet = fleet_forecasts(args.fleet, args.steps)
+        village_steps = args.fleet * args.steps
+        t0 = time.perf_counter()
+        for f in fleet.values():
+            optimize_storage_mpc(f, commit_steps=args.commit)
+        loop = time.perf_counter() - t0
+        print(f"fleet {args.fleet} villages x {args.steps} steps, per-village loop (commit {args.commit}): "
+              f"{loop:.2f}s ({village_steps / loop:,.0f} village-steps/s)")
+        for commit in sorted({args.commit, MPC_FLEET_COMMIT}):
+            t0 = time.perf_counter()
+            optimize_fleet_mpc(fleet, commit_steps=commit)
+            elapsed = time.perf_counter() - t0
+            print(f"fleet optimize_fleet_mpc (commit {commit}): {elapsed:.2f}s "
+                  f"({village_steps / elapsed:,.0f} village-steps/s, x{loop / elapsed:.1f})")
@@ -0,0 +1,50 @@
+# benchmarks/bench_network.py
+import argparse
+import time
+import numpy as np
+import pandas as pd
+from network import VillageNetwork
+
+def cluster_edges(n_villages, cluster_size=20, extra_links=0.5, seed=0):
+    """Radial feeders inside clusters of `cluster_size` villages plus a few meshed ties."""
+    rng = np.random.default_rng(seed)
+    src, dst = [], []
+    for start in range(0, n_villages, cluster_size):
+        members = np.arange(start, min(start + cluster_size, n_villages))
+        for i in members[1:]:
+            src.append(i)
+            dst.append(rng.choice(members[members < i]))
+        n_extra = int(extra_links * len(members))
+        if len(members) > 2 and n_extra:
+            a, b = rng.choice(members, (2, n_extra))
+            keep = a != b
+            src.extend(a[keep])
+            dst.extend(b[keep])
+    m = len(src)
+    return pd.DataFrame({'from': np.array(src).astype(str), 'to': np.array(dst).astype(str),
+                         'capacity_kw': rng.uniform(5, 50, m), 'loss': rng.uniform(0.01, 0.08, m)})
+
+if __name__ == "__main__":
+    ap = argparse.ArgumentParser(description="Per-timestep network sharing solve time")
+    ap.add_argument("--villages", default="500,2000,5000")
+    ap.add_argument("--steps", type=int, default=20)
+    ap.add_argument("--active-share", type=float, default=0.3,
+                    help="fraction of clusters with both exporters and deficits in a step")
+    args = ap.parse_args()
+    rng = np.random.default_rng(1)
+    for n in [int(x) for x in args.villages.split(",")]:
+        net = VillageNetwork([str(i) for i in range(n)], cluster_edges(n))
+        times = []
+        delivered = 0.0
+        for _ in range(args.steps):
+            exporter = rng.random(n) < 0.3
+            cluster_on = rng.random(net.component.max() + 1) < args.active_share
+            on = cluster_on[net.component]
+            surplus = np.where(exporter & on, rng.uniform(0, 40, n), 0.0)
+            deficit = np.where(~exporter, rng.uniform(0, 30, n), 0.0)
+            t0 = time.perf_counter()
+            received, _ = net.solve(surplus, deficit)
+            times.append(time.perf_counter() - t0)
+            delivered += received.sum()
+        print(f"{n:5d} villages, {len(net.capacity) // 2} lines: {np.mean(times) * 1000:7.1f} ms/step "
+              f"(max {np.max(times) * 1000:.1f} ms), delivered {delivered:.0f} kW over {args.steps} steps")
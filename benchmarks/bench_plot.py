@@ -0,0 +1,38 @@
+# benchmarks/bench_plot.py
+import argparse
+import time
+from visualization import plot_fleet_timeseries
+from benchmarks.synthetic import fleet_frame
+
+def measure(frame, **kwargs):
+    t0 = time.perf_counter()
+    fig = plot_fleet_timeseries(frame, column='demand', **kwargs)
+    t_build = time.perf_counter() - t0
+    t0 = time.perf_counter()
+    payload = fig.to_json()  # what st.plotly_chart ships to the browser
+    t_json = time.perf_counter() - t0
+    points = sum(len(t.x) for t in fig.data)
+    return t_build, t_json, len(payload), points
+
+if __name__ == "__main__":
+    ap = argparse.ArgumentParser(description="Chart payload size and build time for long fleet views")
+    ap.add_argument("--villages", type=int, default=50)
+    ap.add_argument("--days", type=int, default=365)
+    ap.add_argument("--minutes", type=int, default=15)
+    ap.add_argument("--max-points", type=int, default=2000)
+    args = ap.parse_args()
+    steps = args.days * 24 * 60 // args.minutes
+    frame = fleet_frame(args.villages, steps, dt_hours=args.minutes / 60)
+    print(f"{args.villages} villages x {steps} steps = {len(frame):,} points")
+    zoom = (frame['timestamp'].iloc[steps // 2], frame['timestamp'].iloc[steps // 2 + 7 * 24 * 60 // args.minutes])
+    modes = [
+        ("full svg", dict(max_points=None, webgl=False)),
+        ("full webgl", dict(max_points=None, webgl=True)),
+        ("minmax webgl", dict(max_points=args.max_points, method="minmax")),
+        ("lttb webgl", dict(max_points=args.max_points, method="lttb")),
+        ("zoom 1 week", dict(max_points=args.max_points, x_range=zoom)),
+    ]
+    for name, kwargs in modes:
+        t_build, t_json, size, points = measure(frame, **kwargs)
+        print(f"{name:<13} {points:>10,} points  build {t_build:6.2f}s  to_json {t_json:6.2f}s  "
+              f"payload {size / 1e6:8.2f} MB")
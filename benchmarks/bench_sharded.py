@@ -0,0 +1,31 @@
+# benchmarks/bench_sharded.py
+import argparse
+import os
+import time
+import numpy as np
+from sharded import simulate_sharded_arrays
+from simulator import simulate_fleet_arrays
+from benchmarks.synthetic import fleet_arrays
+
+if __name__ == "__main__":
+    ap = argparse.ArgumentParser(description="Scaling of the sharded fleet simulation")
+    ap.add_argument("--villages", type=int, default=1000)
+    ap.add_argument("--steps", type=int, default=8760)
+    ap.add_argument("--workers", default="1,4,16,64")
+    ap.add_argument("--block-steps", type=int, default=2048)
+    args = ap.parse_args()
+    demand, solar = fleet_arrays(args.villages, args.steps, dtype=np.float64)
+    demand, solar = demand.T, solar.T
+    t0 = time.perf_counter()
+    ref = simulate_fleet_arrays(demand, solar)
+    t_single = time.perf_counter() - t0
+    print(f"{args.villages} villages x {args.steps} steps on {os.cpu_count()} CPUs; "
+          f"single-process vectorized: {t_single:.2f}s")
+    base = None
+    for w in [int(x) for x in args.workers.split(",")]:
+        t0 = time.perf_counter()
+        out = simulate_sharded_arrays(demand, solar, workers=w, block_steps=args.block_steps)
+        elapsed = time.perf_counter() - t0
+        base = base or elapsed
+        err = np.abs(out['net_import_after_share'] - ref['net_import_after_share']).max()
+        print(f"workers {w:3d}: {elapsed:7.2f}s  speedup {base / elapsed:5.2f}x  max abs diff {err:.1e}")
@@ -0,0 +1,38 @@
+# benchmarks/bench_streaming.py
+import argparse
+import time
+import numpy as np
+from simulator import simulate_fleet_arrays
+from streaming import FleetSimulator
+from benchmarks.synthetic import fleet_arrays
+
+if __name__ == "__main__":
+    ap = argparse.ArgumentParser(description="Tick-by-tick replay vs full recomputation")
+    ap.add_argument("--villages", type=int, default=200)
+    ap.add_argument("--steps", type=int, default=8760)
+    ap.add_argument("--samples", type=int, default=8, help="recompute points used to estimate the full cost")
+    args = ap.parse_args()
+    demand, solar = fleet_arrays(args.villages, args.steps, dtype=np.float64)
+
+    sim = FleetSimulator(range(args.villages))
+    received = np.empty_like(demand)
+    t0 = time.perf_counter()
+    for t in range(args.steps):
+        received[t] = sim.step((demand[t], solar[t]))['received_from_pool']
+    t_stream = time.perf_counter() - t0
+    print(f"replay {args.steps} ticks x {args.villages} villages: {t_stream:.2f}s "
+          f"({t_stream / args.steps * 1e6:.0f} us/tick)")
+
+    full = simulate_fleet_arrays(demand.T, solar.T)
+    print(f"max abs diff vs full run: {np.abs(full['received_from_pool'] - received).max():.2e}")
+
+    # recomputing the whole history on every tick costs sum_t f(t); estimate it from samples
+    points = np.linspace(args.steps // args.samples, args.steps, args.samples, dtype=int)
+    costs = []
+    for n in points:
+        t0 = time.perf_counter()
+        simulate_fleet_arrays(demand[:n].T, solar[:n].T)
+        costs.append(time.perf_counter() - t0)
+    per_step = np.polyfit(points, costs, 1)
+    t_recompute = float(np.polyval(per_step, np.arange(1, args.steps + 1)).sum())
+    print(f"recompute-every-tick estimate: {t_recompute:.0f}s -> streaming is {t_recompute / t_stream:.0f}x faster")
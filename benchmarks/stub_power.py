@@ -0,0 +1,52 @@
+# benchmarks/stub_power.py
+# local stand-in for the NASA POWER daily endpoint, shared by bench_ingest and the tests
+import asyncio
+import threading
+import pandas as pd
+from aiohttp import web
+
+def stub_payload(start, end):
+    days = pd.date_range(pd.to_datetime(start, format="%Y%m%d"), pd.to_datetime(end, format="%Y%m%d"))
+    keys = [d.strftime("%Y%m%d") for d in days]
+    return {"properties": {"parameter": {
+        "ALLSKY_SFC_SW_DWN": {k: 5.0 + (i % 3) * 0.5 for i, k in enumerate(keys)},
+        "WS10M": {k: 3.0 + (i % 4) * 0.25 for i, k in enumerate(keys)},
+    }}}
+
+def start_stub_server(latency=0.05, fail_every=0, port=0, respond=None):
+    """Local stand-in for the POWER daily endpoint; returns (url, stop).
+
+    Every `fail_every`-th call answers 503. `respond(query, n)` may return a
+    web.Response to replace the default payload for call number `n`.
+    """
+    calls = {"n": 0}
+
+    async def handler(request):
+        calls["n"] += 1
+        n = calls["n"]
+        await asyncio.sleep(latency)
+        if fail_every and n % fail_every == 0:
+            return web.Response(status=503)
+        q = request.query
+        if respond is not None:
+            resp = respond(q, n)
+            if resp is not None:
+                return resp
+        return web.json_response(stub_payload(q["start"], q["end"]))
+
+    loop = asyncio.new_event_loop()
+    app = web.Application()
+    app.router.add_get("/api/temporal/daily/point", handler)
+    runner = web.AppRunner(app)
+    loop.run_until_complete(runner.setup())
+    site = web.TCPSite(runner, "127.0.0.1", port)
+    loop.run_until_complete(site.start())
+    bound = site._server.sockets[0].getsockname()[1]
+    thread = threading.Thread(target=loop.run_forever, daemon=True)
+    thread.start()
+
+    def stop():
+        asyncio.run_coroutine_threadsafe(runner.cleanup(), loop).result()
+        loop.call_soon_threadsafe(loop.stop)
+
+    return f"http://127.0.0.1:{bound}/api/temporal/daily/point", stop
@@ -0,0 +1,158 @@
+# benchmarks/suite.py
+import argparse
+import json
+import os
+import platform
+import statistics
+import sys
+import time
+import numpy as np
+import pandas as pd
+from ai_suggestions import make_recommendations
+from forecast import fit_village, forecast_horizon
+from optimizer import optimize_fleet
+from simulator import share_pool_arrays, simulate_fleet_arrays, simulate_multi_village_vectorized
+from storage import simulate_battery
+from benchmarks.synthetic import fleet_frame
+
+BASELINE_FILE = os.path.join(os.path.dirname(__file__), "baseline.json")
+
+# villages/steps for the data-parallel stages; training only fits `train_villages` forests
+SCALES = {
+    'small': dict(villages=3, steps=24 * 14, train_villages=3, repeats=5),
+    'medium': dict(villages=50, steps=24 * 90, train_villages=5, repeats=3),
+    'fleet': dict(villages=500, steps=24 * 365, train_villages=10, repeats=1),
+}
+
+def _forecasts(df):
+    return {v: g[['timestamp', 'village', 'demand', 'solar']].reset_index(drop=True)
+            for v, g in df.groupby('village', sort=False)}
+
+def _fleet_arrays(df, n_villages):
+    demand = df['demand'].to_numpy(dtype=float).reshape(n_villages, -1)
+    solar = df['solar'].to_numpy(dtype=float).reshape(n_villages, -1)
+    return demand, solar
+
+def _setup_train(df, scale):
+    train = df[df['village'].isin([str(v) for v in range(scale['train_villages'])])]
+    groups = [g for _, g in train.groupby('village')]
+    return lambda: [fit_village(g, n_jobs=1) for g in groups], len(train)
+
+def _setup_forecast(df, scale):
+    train = df[df['village'].isin([str(v) for v in range(scale['train_villages'])])]
+    models = {v: fit_village(g, n_jobs=1) for v, g in train.groupby('village')}
+    villages = list(models)
+    return lambda: forecast_horizon(train, models, villages, horizon_hours=24), 24 * len(villages)
+
+def _setup_dispatch(df, scale):
+    forecasts = _forecasts(df)
+    return lambda: optimize_fleet(forecasts), len(df)
+
+def _setup_sharing(df, scale):
+    demand, solar = _fleet_arrays(df, scale['villages'])
+    cols = simulate_fleet_arrays(demand, solar)
+    args = (cols['solar'], cols['demand'], cols['battery_soc'], cols['net_import_kw'])
+    return lambda: share_pool_arrays(*args), len(df)
+
+def _setup_simulate(df, scale):
+    forecasts = _forecasts(df)
+    return lambda: simulate_multi_village_vectorized(forecasts), len(df)
+
+def _setup_battery(df, scale):
+    demand, solar = _fleet_arrays(df, scale['villages'])
+    pairs = list(zip(demand.tolist(), solar.tolist()))
+    return lambda: [simulate_battery(d, s) for d, s in pairs], len(df)
+
+def _setup_recommend(df, scale):
+    forecasts = _forecasts(df)
+    schedules = simulate_multi_village_vectorized(forecasts)
+    items = [(schedules[v], forecasts[v], v) for v in forecasts]
+    return lambda: [make_recommendations(s, f, v) for s, f, v in items], len(items)
+
+SCENARIOS = {
+    'train': _setup_train,
+    'forecast': _setup_forecast,
+    'dispatch': _setup_dispatch,
+    'sharing': _setup_sharing,
+    'simulate': _setup_simulate,
+    'battery': _setup_battery,
+    'recommend': _setup_recommend,
+}
+
+def run_scenario(name, scale_name, df, repeats=None):
+    """Time one scenario: setup is excluded, one warm-up call, then `repeats` timed calls."""
+    scale = SCALES[scale_name]
+    fn, items = SCENARIOS[name](df, scale)
+    repeats = repeats or scale['repeats']
+    if repeats > 1:
+        fn()
+    times = []
+    for _ in range(repeats):
+        t0 = time.perf_counter()
+        fn()
+        times.append(time.perf_counter() - t0)
+    median = statistics.median(times)
+    return {'scenario': name, 'scale': scale_name, 'items': int(items), 'repeats': repeats,
+            'median_s': median, 'min_s': min(times), 'items_per_s': items / median if median else None}
+
+def environment():
+    import sklearn
+    return {'python': platform.python_version(), 'platform': platform.platform(),
+            'cpus': os.cpu_count(), 'numpy': np.__version__, 'pandas': pd.__version__,
+            'sklearn': sklearn.__version__}
+
+def run_suite(scales, scenarios, seed=0, repeats=None, log=print):
+    results = []
+    for scale_name in scales:
+        scale = SCALES[scale_name]
+        df = fleet_frame(scale['villages'], scale['steps'], seed=seed)
+        for name in scenarios:
+            r = run_scenario(name, scale_name, df, repeats)
+            log(f"{scale_name:>6} {name:<10} {r['median_s'] * 1000:10.1f} ms  "
+                f"({r['items_per_s']:,.0f} items/s)")
+            results.append(r)
+    return {'seed': seed, 'environment': environment(), 'results': results}
+
+def compare(report, baseline, tolerance=0.25, min_delta=0.005):
+    """Rows of (key, baseline s, current s, ratio, regressed) for scenarios present in both.
+
+    A scenario regresses when it is more than `tolerance` slower and also at least
+    `min_delta` seconds slower, so sub-millisecond timer noise never fails a run.
+    """
+    old = {(r['scenario'], r['scale']): r['median_s'] for r in baseline['results']}
+    rows = []
+    for r in report['results']:
+        key = (r['scenario'], r['scale'])
+        if key in old and old[key] > 0:
+            ratio = r['median_s'] / old[key]
+            regressed = ratio > 1 + tolerance and r['median_s'] - old[key] >= min_delta
+            rows.append((key, old[key], r['median_s'], ratio, regressed))
+    return rows
+
+if __name__ == "__main__":
+    ap = argparse.ArgumentParser(description="EnerShift benchmark suite")
+    ap.add_argument("--scales", default="small,medium", help=f"comma list of {', '.join(SCALES)}")
+    ap.add_argument("--scenarios", default=",".join(SCENARIOS))
+    ap.add_argument("--seed", type=int, default=0)
+    ap.add_argument("--repeats", type=int, default=None, help="override the per-scale repeat count")
+    ap.add_argument("--out", default="bench_results.json")
+    ap.add_argument("--baseline", default=BASELINE_FILE)
+    ap.add_argument("--tolerance", type=float, default=0.25, help="allowed slowdown before failing")
+    ap.add_argument("--save-baseline", action="store_true", help="write this run as the new baseline")
+    args = ap.parse_args()
+    report = run_suite(args.scales.split(","), args.scenarios.split(","), args.seed, args.repeats)
+    with open(args.out, "w") as f:
+        json.dump(report, f, indent=2)
+    print(f"wrote {args.out}")
+    if args.save_baseline:
+        with open(args.baseline, "w") as f:
+            json.dump(report, f, indent=2)
+        print(f"saved baseline {args.baseline}")
+    elif os.path.exists(args.baseline):
+        with open(args.baseline) as f:
+            rows = compare(report, json.load(f), args.tolerance)
+        for (name, scale), old, new, ratio, regressed in rows:
+            flag = "REGRESSION" if regressed else ""
+            print(f"{scale:>6} {name:<10} {old * 1000:10.1f} -> {new * 1000:10.1f} ms  x{ratio:.2f} {flag}")
+        if any(r[4] for r in rows):
+            sys.exit(1)
@@ -0,0 +1,91 @@
+# benchmarks/synthetic.py
+import os
+import numpy as np
+import pandas as pd
+
+def fleet_arrays(n_villages, n_steps, dt_hours=1.0, seed=0, dtype=np.float32):
+    """Deterministic timesteps x villages demand and solar (kW) with a diurnal shape."""
+    rng = np.random.default_rng(seed)
+    hour = (np.arange(n_steps) * dt_hours) % 24
+    daylight = np.clip(np.sin((hour - 6) / 12 * np.pi), 0, None).astype(dtype)
+    pv_size = rng.uniform(20, 150, n_villages).astype(dtype)
+    base_load = rng.uniform(10, 60, n_villages).astype(dtype)
+    solar = daylight[:, None] * pv_size[None, :]
+    solar *= rng.uniform(0.6, 1.0, (n_steps, n_villages)).astype(dtype)
+    evening = (1 + 0.5 * np.exp(-((hour - 20) / 2.5) ** 2)).astype(dtype)
+    demand = evening[:, None] * base_load[None, :]
+    demand *= rng.uniform(0.8, 1.2, (n_steps, n_villages)).astype(dtype)
+    return demand, solar
+
+def fleet_forecasts(n_villages, n_steps, dt_hours=1.0, seed=0, start="2025-01-01"):
+    """Same data as fleet_arrays as the dict of per-village frames the simulator takes."""
+    demand, solar = fleet_arrays(n_villages, n_steps, dt_hours, seed, dtype=np.float64)
+    ts = pd.date_range(start, periods=n_steps, freq=pd.Timedelta(hours=dt_hours))
+    return {str(v): pd.DataFrame({'timestamp': ts, 'village': str(v),
+                                  'demand': demand[:, v], 'solar': solar[:, v]})
+            for v in range(n_villages)}
+
+def fleet_frame(n_villages, n_steps, dt_hours=1.0, seed=0, start="2025-09-01"):
+    """Long timestamp/village/solar/wind/demand frame with enershift_data.csv magnitudes.
+
+    Clear-sky solar with day-to-day cloudiness, wind with an afternoon rise and daily
+    level changes, and demand with morning and evening peaks on a per-village base load.
+    """
+    rng = np.random.default_rng(seed)
+    hour = (np.arange(n_steps) * dt_hours) % 24
+    day = (np.arange(n_steps) * dt_hours // 24).astype(int)
+    n_days = day[-1] + 1 if n_steps else 0
+    daylight = np.clip(np.sin((hour - 6) / 12 * np.pi), 0, None) ** 1.5
+    clear = rng.uniform(0.55, 1.0, (n_days, n_villages))[day]
+    solar = daylight[:, None] * rng.uniform(50, 90, n_villages)[None, :] * clear
+    solar *= rng.uniform(0.9, 1.1, (n_steps, n_villages))
+    gusts = rng.normal(0, 1.5, (n_days, n_villages))[day] + rng.normal(0, 0.3, (n_steps, n_villages))
+    wind = rng.uniform(8, 12, n_villages)[None, :] + 3 * np.exp(-((hour - 14) / 4) ** 2)[:, None] + gusts
+    profile = (1 + 0.6 * np.exp(-((hour - 10) / 3) ** 2) + 1.3 * np.exp(-((hour - 19.5) / 1.8) ** 2))
+    demand = profile[:, None] * rng.uniform(150, 300, n_villages)[None, :]
+    demand *= rng.uniform(0.95, 1.05, (n_steps, n_villages))
+    ts = pd.date_range(start, periods=n_steps, freq=pd.Timedelta(hours=dt_hours))
+    return pd.DataFrame({
+        'timestamp': np.tile(ts.to_numpy(), n_villages),
+        'village': np.repeat(np.arange(n_villages).astype(str), n_steps),
+        'solar': np.round(solar.T.ravel(), 1),
+        'wind': np.round(np.clip(wind, 0, None).T.ravel(), 1),
+        'demand': np.round(demand.T.ravel(), 1),
+    })
+
+def enershift_csv_frame(n_steps, dt_hours=1.0, seed=0, start="2025-09-01"):
+    """Single-site frame with the enershift_data.csv columns (DATE_TIME, solar, wind, demand)."""
+    df = fleet_frame(1, n_steps, dt_hours, seed, start).drop(columns='village')
+    return df.rename(columns={'timestamp': 'DATE_TIME'})
+
+def write_plant_csvs(directory, days, inverters=22, freq_minutes=15, seed=0, block_days=5):
+    """Synthetic Plant_*_Generation/Weather CSVs in the Kaggle layout, written block by block."""
+    rng = np.random.default_rng(seed)
+    gen_path = os.path.join(directory, "gen.csv")
+    weather_path = os.path.join(directory, "weather.csv")
+    steps_per_day = 24 * 60 // freq_minutes
+    start = pd.Timestamp("2020-05-15")
+    for d0 in range(0, days, block_days):
+        n_days = min(block_days, days - d0)
+        ts = start + pd.to_timedelta(np.arange(d0 * steps_per_day, (d0 + n_days) * steps_per_day)
+                                     * freq_minutes, unit="min")
+        hour = (ts.hour + ts.minute / 60).to_numpy()
+        sun = np.clip(np.sin((hour - 6) / 12 * np.pi), 0, None)
+        ac = (sun[:, None] * rng.uniform(800, 1200, (len(ts), inverters))).ravel()
+        gen = pd.DataFrame({
+            "DATE_TIME": np.repeat(ts.strftime("%Y-%m-%d %H:%M:%S"), inverters),
+            "PLANT_ID": 4135001,
+            "SOURCE_KEY": np.tile([f"inv{i:02d}" for i in range(inverters)], len(ts)),
+            "DC_POWER": ac * 10.2, "AC_POWER": ac,
+            "DAILY_YIELD": 0.0, "TOTAL_YIELD": 0.0,
+        })
+        # weather is logged slightly off the generation grid
+        wts = ts + pd.Timedelta(seconds=30)
+        weather = pd.DataFrame({
+            "DATE_TIME": wts.strftime("%Y-%m-%d %H:%M:%S"), "PLANT_ID": 4135001, "SOURCE_KEY": "sensor",
+            "AMBIENT_TEMPERATURE": 25 + 5 * sun, "MODULE_TEMPERATURE": 25 + 20 * sun,
+            "IRRADIATION": sun, "WIND_SPEED": rng.gamma(2.0, 2.0, len(ts)),
+        })
+        gen.to_csv(gen_path, mode="a", header=d0 == 0, index=False)
+        weather.to_csv(weather_path, mode="a", header=d0 == 0, index=False)
+    return gen_path, weather_path
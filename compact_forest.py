@@ -0,0 +1,246 @@
+# compact_forest.py
+import json
+import os
+import re
+import shutil
+from collections.abc import Mapping
+import numpy as np
+
+ARRAYS = ('feature', 'threshold', 'left', 'right', 'value', 'roots')
+INDEX_FILE = "index.json"
+STACK_DIR = "_stacks"  # per-kind ForestStacks of the whole store, written on first use
+
+class CompactForest:
+    """A fitted regression forest flattened into contiguous node arrays.
+
+    All trees share one node space: `roots` holds each tree's first node and leaves
+    point to themselves, so a fixed number of `depth` steps walks every sample/tree
+    pair to its leaf without branching. Predictions match sklearn's (inputs are cast
+    to float32 before comparison, as sklearn does).
+    """
+
+    def __init__(self, feature, threshold, left, right, value, roots, depth):
+        self.feature = feature
+        self.threshold = threshold
+        self.left = left
+        self.right = right
+        self.value = value
+        self.roots = roots
+        self.depth = int(depth)
+
+    @classmethod
+    def from_sklearn(cls, forest):
+        parts = {k: [] for k in ARRAYS}
+        offset = 0
+        depth = 0
+        for est in forest.estimators_:
+            t = est.tree_
+            n = t.node_count
+            own = np.arange(offset, offset + n, dtype=np.int32)
+            leaf = t.children_left < 0
+            parts['feature'].append(np.where(leaf, 0, t.feature).astype(np.int32))
+            parts['threshold'].append(np.where(leaf, 0.0, t.threshold))
+            parts['left'].append(np.where(leaf, own, t.children_left + offset).astype(np.int32))
+            parts['right'].append(np.where(leaf, own, t.children_right + offset).astype(np.int32))
+            parts['value'].append(t.value[:, 0, 0].astype(np.float64))
+            parts['roots'].append(np.array([offset], dtype=np.int32))
+            depth = max(depth, t.max_depth)
+            offset += n
+        return cls(*(np.concatenate(parts[k]) for k in ARRAYS), depth=depth)
+
+    def save(self, directory):
+        os.makedirs(directory, exist_ok=True)
+        for k in ARRAYS:
+            np.save(os.path.join(directory, k + '.npy'), np.ascontiguousarray(getattr(self, k)))
+        with open(os.path.join(directory, 'meta.json'), 'w') as fh:
+            json.dump({'depth': self.depth, 'n_trees': int(len(self.roots)),
+                       'n_nodes': int(len(self.value))}, fh)
+
+    @classmethod
+    def load(cls, directory, mmap=True):
+        with open(os.path.join(directory, 'meta.json')) as fh:
+            meta = json.load(fh)
+        mode = 'r' if mmap else None
+        arrays = [np.load(os.path.join(directory, k + '.npy'), mmap_mode=mode) for k in ARRAYS]
+        return cls(*arrays, depth=meta['depth'])
+
+    def leaves(self, X, roots=None):
+        """Leaf node reached by every row of X in every tree (rows x trees)."""
+        X = np.asarray(X, dtype=np.float32)
+        roots = self.roots if roots is None else roots
+        node = np.broadcast_to(roots, (len(X),) + np.shape(roots)[-1:]).copy()
+        rows = np.arange(len(X))[:, None]
+        for _ in range(self.depth):
+            go_left = X[rows, self.feature[node]] <= self.threshold[node]
+            node = np.where(go_left, self.left[node], self.right[node])
+        return node
+
+    def predict(self, X):
+        if hasattr(X, 'to_numpy'):
+            X = X.to_numpy()
+        return self.value[self.leaves(X)].mean(axis=1)
+
+def _safe(vid):
+    return re.sub(r'[^A-Za-z0-9_.-]', '_', str(vid))
+
+def export_models(models, directory):
+    """Write {village: model dict} (as from train_or_load_models) as a compact store."""
+    os.makedirs(directory, exist_ok=True)
+    shutil.rmtree(os.path.join(directory, STACK_DIR), ignore_errors=True)
+    index = {}
+    for vid, m in models.items():
+        sub = _safe(vid)
+        path = os.path.join(directory, sub)
+        os.makedirs(path, exist_ok=True)
+        kinds = []
+        for kind in ('demand', 'solar'):
+            if m.get(kind) is not None:
+                CompactForest.from_sklearn(m[kind]).save(os.path.join(path, kind))
+                kinds.append(kind)
+        with open(os.path.join(path, 'village.json'), 'w') as fh:
+            json.dump({'mean_demand': m['mean_demand'], 'mean_solar': m['mean_solar'],
+                       'models': kinds}, fh)
+        index[str(vid)] = sub
+    with open(os.path.join(directory, INDEX_FILE), 'w') as fh:
+        json.dump(index, fh, indent=2, sort_keys=True)
+    return CompactModelStore(directory)
+
+class CompactModelStore(Mapping):
+    """Read-only {village: model dict} view over an exported store.
+
+    Nothing is read until a village is requested; its forests are then memory-mapped
+    and cached. Usable wherever forecast_horizon expects the models dict.
+    """
+
+    def __init__(self, directory, mmap=True):
+        self.directory = directory
+        self.mmap = mmap
+        with open(os.path.join(directory, INDEX_FILE)) as fh:
+            self._index = json.load(fh)
+        self._loaded = {}
+        self._stacks = {}
+
+    def stack(self, kind):
+        """ForestStack of every village's `kind` forest. Built and saved inside the store
+        the first time, memory-mapped on every later load."""
+        if kind not in self._stacks:
+            path = os.path.join(self.directory, STACK_DIR, kind)
+            if not os.path.exists(os.path.join(path, 'stack.json')):
+                keys = [v for v in self if self[v].get(kind) is not None]
+                tmp = f"{path}.{os.getpid()}.tmp"
+                ForestStack([self[v][kind] for v in keys], keys).save(tmp)
+                try:
+                    os.replace(tmp, path)
+                except OSError:  # another process saved it first
+                    shutil.rmtree(tmp, ignore_errors=True)
+            self._stacks[kind] = ForestStack.load(path, mmap=self.mmap)
+        return self._stacks[kind]
+
+    def __getitem__(self, vid):
+        key = str(vid)
+        if key not in self._loaded:
+            if key not in self._index:
+                raise KeyError(vid)
+            path = os.path.join(self.directory, self._index[key])
+            with open(os.path.join(path, 'village.json')) as fh:
+                meta = json.load(fh)
+            m = {'demand': None, 'solar': None,
+                 'mean_demand': meta['mean_demand'], 'mean_solar': meta['mean_solar']}
+            for kind in meta['models']:
+                m[kind] = CompactForest.load(os.path.join(path, kind), mmap=self.mmap)
+            self._loaded[key] = m
+        return self._loaded[key]
+
+    def __iter__(self):
+        return iter(self._index)
+
+    def __len__(self):
+        return len(self._index)
+
+class ForestStack:
+    """Several compact forests in one node space, so rows that belong to different
+    forests (e.g. one row per village) are predicted in a single traversal.
+
+    `keys` name the forests (default 0..n-1); `index` maps a key to its member number.
+    Node indices are int64, as a fleet's combined node count can exceed int32.
+    """
+
+    def __init__(self, forests, keys=None):
+        forests = [f if isinstance(f, CompactForest) else CompactForest.from_sklearn(f) for f in forests]
+        parts = {k: [] for k in ARRAYS[:-1]}
+        offsets = []
+        offset = 0
+        for f in forests:
+            offsets.append(offset)
+            parts['feature'].append(np.asarray(f.feature))
+            parts['threshold'].append(np.asarray(f.threshold))
+            parts['left'].append(np.asarray(f.left, dtype=np.int64) + offset)
+            parts['right'].append(np.asarray(f.right, dtype=np.int64) + offset)
+            parts['value'].append(np.asarray(f.value))
+            offset += len(f.value)
+        # shared zero-valued leaf that pads forests with fewer trees
+        pad = np.array([offset], dtype=np.int64)
+        parts['feature'].append(np.zeros(1, dtype=np.int32))
+        parts['threshold'].append(np.zeros(1))
+        parts['left'].append(pad)
+        parts['right'].append(pad)
+        parts['value'].append(np.zeros(1))
+        self.n_trees = np.array([len(f.roots) for f in forests], dtype=np.int64)
+        roots = np.full((len(forests), self.n_trees.max(initial=0)), offset, dtype=np.int64)
+        for i, f in enumerate(forests):
+            roots[i, :len(f.roots)] = np.asarray(f.roots, dtype=np.int64) + offsets[i]
+        self.forest = CompactForest(*(np.concatenate(parts[k]) for k in ARRAYS[:-1]), roots=roots,
+                                    depth=max((f.depth for f in forests), default=0))
+        self._set_keys(range(len(forests)) if keys is None else keys)
+
+    def _set_keys(self, keys):
+        self.keys = list(keys)
+        self.index = {k: i for i, k in enumerate(self.keys)}
+
+    def save(self, directory):
+        self.forest.save(directory)
+        np.save(os.path.join(directory, 'n_trees.npy'), self.n_trees)
+        with open(os.path.join(directory, 'stack.json'), 'w') as fh:
+            json.dump({'keys': self.keys}, fh)
+
+    @classmethod
+    def load(cls, directory, mmap=True):
+        stack = cls.__new__(cls)
+        stack.forest = CompactForest.load(directory, mmap=mmap)
+        stack.n_trees = np.load(os.path.join(directory, 'n_trees.npy'))
+        with open(os.path.join(directory, 'stack.json')) as fh:
+            stack._set_keys(json.load(fh)['keys'])
+        return stack
+
+    def predict(self, X, members):
+        """Predict row i of X with forest members[i]."""
+        members = np.asarray(members)
+        leaves = self.forest.leaves(X, self.forest.roots[members])
+        return self.forest.value[leaves].sum(axis=1) / self.n_trees[members]
+
+_stack_cache = []  # [(models, {kind: (keys, forests, ForestStack)})], newest last
+_STACK_CACHE_SIZE = 4
+
+def forest_stack(models, kind):
+    """ForestStack over every village of `models` that has a `kind` forest.
+
+    A CompactModelStore keeps (and persists) its own stacks; a plain models dict gets
+    its stack built once and reused while the dict holds the same forest objects under
+    the same villages (the cache keeps them alive, so an identity check is safe).
+    """
+    if isinstance(models, CompactModelStore):
+        return models.stack(kind)
+    keys = [v for v, m in models.items() if m and m.get(kind) is not None]
+    forests = [models[v][kind] for v in keys]
+    entry = next((e for e in _stack_cache if e[0] is models), None)
+    if entry is not None and kind in entry[1]:
+        old_keys, old_forests, stack = entry[1][kind]
+        if old_keys == keys and all(a is b for a, b in zip(old_forests, forests)):
+            return stack
+    stack = ForestStack(forests, keys)
+    if entry is None:
+        entry = (models, {})
+        _stack_cache.append(entry)
+        del _stack_cache[:-_STACK_CACHE_SIZE]
+    entry[1][kind] = (keys, forests, stack)
+    return stack
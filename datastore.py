@@ -0,0 +1,135 @@
+# datastore.py
+import hashlib
+import itertools
+import json
+import os
+import time
+import uuid
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.dataset as ds
+
+STORE_DIR = "enershift_store"
+VALUE_COLUMNS = ['solar', 'wind', 'demand']
+PARTITIONING = ds.partitioning(pa.schema([('village', pa.string()), ('month', pa.string())]),
+                               flavor='hive')
+ROW_GROUP_ROWS = 24 * 4 * 7  # one week of 15-minute readings per row group
+_writes = itertools.count()  # orders writes made within the same nanosecond
+
+def _month_key(ts):
+    return (ts.dt.year * 100 + ts.dt.month).map(lambda m: f"{m // 100:04d}-{m % 100:02d}")
+
+def write_store(df, root=STORE_DIR, row_group_rows=ROW_GROUP_ROWS):
+    """Append timestamp/village/solar/wind/demand rows to a village/month partitioned store.
+
+    Values are stored as float32 and each file is sorted by timestamp, so row-group
+    min/max statistics let time-range filters skip data inside a partition as well.
+    File names start with the write time, and load_store keeps the newest copy of a
+    (village, timestamp) reading, so writing the same source again is idempotent.
+    `df` itself must hold at most one row per (village, timestamp).
+    """
+    dup = df.duplicated(['village', 'timestamp'])
+    if dup.any():
+        first = df.loc[dup, ['village', 'timestamp']].iloc[0]
+        raise ValueError(f"{int(dup.sum())} duplicate (village, timestamp) rows, e.g. village "
+                         f"{first['village']} at {first['timestamp']}; aggregate them before write_store")
+    d = pd.DataFrame({'timestamp': pd.to_datetime(df['timestamp']).astype('datetime64[ns]'),
+                      'village': df['village'].astype(str)})
+    for col in VALUE_COLUMNS:
+        d[col] = df[col].astype(np.float32) if col in df.columns else np.float32(np.nan)
+    d['month'] = _month_key(d['timestamp'])
+    d = d.sort_values(['village', 'timestamp'], kind='stable')
+    table = pa.Table.from_pandas(d, preserve_index=False)
+    ds.write_dataset(table, root, format='parquet', partitioning=PARTITIONING,
+                     basename_template=f"part-{time.time_ns():020d}-{next(_writes):06d}-{uuid.uuid4().hex[:8]}-{{i}}.parquet",
+                     existing_data_behavior='overwrite_or_ignore',
+                     max_rows_per_group=row_group_rows, min_rows_per_group=min(row_group_rows, 1024))
+    return len(d)
+
+def csv_to_store(path, root=STORE_DIR, village="1"):
+    """Import a single-village CSV laid out like enershift_data.csv (DATE_TIME, solar, wind, demand)."""
+    df = pd.read_csv(path, parse_dates=['DATE_TIME']).rename(columns={'DATE_TIME': 'timestamp'})
+    if 'village' not in df.columns:
+        df['village'] = village
+    return write_store(df, root)
+
+def _filter(villages=None, start=None, end=None):
+    expr = None
+
+    def both(a, b):
+        return b if a is None else a & b
+
+    if villages is not None:
+        expr = both(expr, ds.field('village').isin([str(v) for v in villages]))
+    if start is not None:
+        start = pd.Timestamp(start)
+        expr = both(expr, ds.field('month') >= start.strftime('%Y-%m'))
+        expr = both(expr, ds.field('timestamp') >= pa.scalar(start.to_datetime64().astype('datetime64[ns]')))
+    if end is not None:
+        end = pd.Timestamp(end)
+        expr = both(expr, ds.field('month') <= end.strftime('%Y-%m'))
+        expr = both(expr, ds.field('timestamp') < pa.scalar(end.to_datetime64().astype('datetime64[ns]')))
+    return expr
+
+def load_store(root=STORE_DIR, villages=None, start=None, end=None, columns=None):
+    """Rows for `villages` with start <= timestamp < end, as a long frame.
+
+    The village and month filters prune whole partitions and the timestamp filter is
+    pushed down to Parquet row groups, so only the needed data is read. village comes
+    back categorical and values as float32. A reading written more than once (e.g. a
+    re-ingested source) is returned once, from the latest write.
+    """
+    dataset = ds.dataset(root, format='parquet', partitioning=PARTITIONING)
+    cols = ['timestamp', 'village'] + (list(columns) if columns is not None else VALUE_COLUMNS)
+    table = dataset.to_table(columns=cols + ['__filename'], filter=_filter(villages, start, end))
+    # write order of each row's file: names sort by write time (see write_store)
+    files = table.column('__filename').dictionary_encode().combine_chunks()
+    rank = np.argsort(np.argsort(files.dictionary.to_numpy(zero_copy_only=False)))
+    df = table.drop_columns(['__filename']).to_pandas()
+    df['village'] = df['village'].astype('category')
+    df['_written'] = rank[files.indices.to_numpy()] if len(df) else np.zeros(0, dtype=int)
+    df = df.sort_values(['village', 'timestamp', '_written'], kind='stable')
+    df = df.drop_duplicates(['village', 'timestamp'], keep='last')
+    return df.drop(columns='_written').reset_index(drop=True)
+
+def load_village_frames(root=STORE_DIR, villages=None, start=None, end=None):
+    """{village: frame} as simulate_multi_village and optimize_fleet take."""
+    df = load_store(root, villages, start, end)
+    return {str(v): g.drop(columns='village').reset_index(drop=True).assign(village=str(v))
+            for v, g in df.groupby('village', observed=True)}
+
+def load_fleet_arrays(root=STORE_DIR, villages=None, start=None, end=None):
+    """(timestamps, villages, demand, solar) with villages x timesteps float32 blocks for
+    optimizer.dispatch_arrays.
+
+    The dispatcher carries state from step to step, so one NaN would poison a village's
+    SOC from then on: gaps are forward-filled from the previous reading (leading gaps
+    from the first one), a village without any solar reading gets 0, and a village
+    without any demand reading raises ValueError.
+    """
+    df = load_store(root, villages, start, end, columns=['demand', 'solar'])
+    demand = df.pivot(index='village', columns='timestamp', values='demand')
+    solar = df.pivot(index='village', columns='timestamp', values='solar').reindex_like(demand)
+    empty = demand.isna().all(axis=1)
+    if empty.any():
+        raise ValueError(f"no demand readings for villages {[str(v) for v in demand.index[empty]]} in {root}")
+    demand = demand.ffill(axis=1).bfill(axis=1)
+    solar = solar.ffill(axis=1).bfill(axis=1).fillna(0.0)
+    return (demand.columns, [str(v) for v in demand.index],
+            demand.to_numpy(dtype=np.float32), solar.to_numpy(dtype=np.float32))
+
+def _fingerprint(obj):
+    return hashlib.sha1(json.dumps(obj, sort_keys=True, default=str).encode()).hexdigest()[:16]
+
+def source_fingerprint(path):
+    """Size and mtime of the source file, or of every file under a store directory."""
+    if os.path.isdir(path):
+        entries = []
+        for root, _, files in os.walk(path):
+            for name in sorted(files):
+                st = os.stat(os.path.join(root, name))
+                entries.append((os.path.relpath(os.path.join(root, name), path), st.st_size, st.st_mtime_ns))
+        return _fingerprint(sorted(entries))
+    st = os.stat(path)
+    return _fingerprint([os.path.abspath(path), st.st_size, st.st_mtime_ns])
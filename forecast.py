@@ -3,19 +3,42 @@ import pandas as pd
 import numpy as np
 from sklearn.ensemble import RandomForestRegressor
 import joblib, os
+from profiling import profiled, stage
 
 MODEL_FILE = "enershift_rf_models.joblib"
+FEATURES = ['hour','minute','dow','month','lag1','solar_lag1']
+MIN_TRAIN_ROWS = 50
+RF_PARAMS = {'demand': dict(n_estimators=120, random_state=42),
+             'solar': dict(n_estimators=80, random_state=42)}
 
+@profiled("forecast.features", rows=len)
 def _make_features(df):
     d = df.copy()
     d['hour'] = d['timestamp'].dt.hour
     d['minute'] = d['timestamp'].dt.minute
     d['dow'] = d['timestamp'].dt.dayofweek
     d['month'] = d['timestamp'].dt.month
-    d['lag1'] = d.groupby('village')['demand'].shift(1).fillna(method='bfill')
+    d['lag1'] = d.groupby('village')['demand'].shift(1).bfill()
     d['solar_lag1'] = d.groupby('village')['solar'].shift(1).fillna(0)
     return d
 
+@profiled("forecast.train", rows=len, village=lambda g: g['village'].iloc[0] if len(g) else None)
+def fit_village(grp, n_jobs=-1):
+    g = grp.sort_values('timestamp').reset_index(drop=True)
+    g = _make_features(g)
+    X = g[FEATURES].fillna(0)
+    y = g['demand'].values
+    if len(g) < MIN_TRAIN_ROWS:
+        return {'demand': None, 'mean_demand': float(g['demand'].mean()), 'mean_solar': float(g['solar'].mean())}
+    rf = RandomForestRegressor(n_jobs=n_jobs, **RF_PARAMS['demand'])
+    rf.fit(X, y)
+    # solar predictor (optional)
+    rf_s = None
+    if 'solar' in g.columns and g['solar'].notna().sum() >= MIN_TRAIN_ROWS:
+        rf_s = RandomForestRegressor(n_jobs=n_jobs, **RF_PARAMS['solar'])
+        rf_s.fit(X, g['solar'].values)
+    return {'demand': rf, 'solar': rf_s, 'mean_demand': float(g['demand'].mean()), 'mean_solar': float(g['solar'].mean())}
+
 def train_or_load_models(df, force_retrain=False):
     if (not force_retrain) and os.path.exists(MODEL_FILE):
         try:
@@ -25,45 +48,211 @@ def train_or_load_models(df, force_retrain=False):
     models = {}
     # train per village
     for vid, grp in df.groupby('village'):
-        g = grp.sort_values('timestamp').reset_index(drop=True)
-        g = _make_features(g)
-        feats = ['hour','minute','dow','month','lag1','solar_lag1']
-        X = g[feats].fillna(0)
-        y = g['demand'].values
-        if len(g) < 50:
-            models[vid] = {'demand': None, 'mean_demand': float(g['demand'].mean()), 'mean_solar': float(g['solar'].mean())}
-            continue
-        rf = RandomForestRegressor(n_estimators=120, random_state=42, n_jobs=-1)
-        rf.fit(X, y)
-        # solar predictor (optional)
-        rf_s = None
-        if 'solar' in g.columns and g['solar'].notna().sum() >= 50:
-            rf_s = RandomForestRegressor(n_estimators=80, random_state=42, n_jobs=-1)
-            rf_s.fit(X, g['solar'].values)
-        models[vid] = {'demand': rf, 'solar': rf_s, 'mean_demand': float(g['demand'].mean()), 'mean_solar': float(g['solar'].mean())}
+        models[vid] = fit_village(grp)
     joblib.dump(models, MODEL_FILE)
     return models
 
 def forecast_horizon(df, models, villages, horizon_hours=24, res_minutes=60):
-    freq = f"{res_minutes}T"
+    freq = pd.Timedelta(minutes=res_minutes)
     last = df['timestamp'].max()
     periods = int(horizon_hours * 60 / res_minutes)
     future_idx = pd.date_range(last + pd.Timedelta(minutes=res_minutes), periods=periods, freq=freq)
     results = {}
     for vid in villages:
-        tmpl = pd.DataFrame({'timestamp': future_idx})
-        tmpl['village'] = vid
-        tmpl_feat = _make_features(tmpl.assign(demand=0, solar=0))
-        feats = ['hour','minute','dow','month','lag1','solar_lag1']
-        Xp = tmpl_feat[feats].fillna(0)
-        m = models.get(vid)
-        if (m is None) or (m.get('demand') is None):
-            tmpl['demand'] = m['mean_demand'] if m else df['demand'].mean()
-        else:
-            tmpl['demand'] = m['demand'].predict(Xp).clip(min=0)
-        if (m is None) or (m.get('solar') is None):
-            tmpl['solar'] = m['mean_solar'] if m else df['solar'].mean()
-        else:
-            tmpl['solar'] = m['solar'].predict(Xp).clip(min=0)
-        results[vid] = tmpl[['timestamp','village','demand','solar']].reset_index(drop=True)
+        with stage("forecast.predict", rows=periods, village=vid):
+            tmpl = pd.DataFrame({'timestamp': future_idx})
+            tmpl['village'] = vid
+            tmpl_feat = _make_features(tmpl.assign(demand=0, solar=0))
+            Xp = tmpl_feat[FEATURES].fillna(0)
+            m = models.get(vid)
+            if (m is None) or (m.get('demand') is None):
+                tmpl['demand'] = m['mean_demand'] if m else df['demand'].mean()
+            else:
+                tmpl['demand'] = m['demand'].predict(Xp).clip(min=0)
+            if (m is None) or (m.get('solar') is None):
+                tmpl['solar'] = m['mean_solar'] if m else df['solar'].mean()
+            else:
+                tmpl['solar'] = m['solar'].predict(Xp).clip(min=0)
+            results[vid] = tmpl[['timestamp','village','demand','solar']].reset_index(drop=True)
     return results
+
+def _future_calendar(df, horizon_hours, res_minutes):
+    # future index after the last observation and its float32 hour/minute/dow/month rows
+    step = pd.Timedelta(minutes=res_minutes)
+    periods = int(horizon_hours * 60 / res_minutes)
+    future_idx = pd.date_range(df['timestamp'].max() + step, periods=periods, freq=step)
+    calendar = np.column_stack([future_idx.hour, future_idx.minute, future_idx.dayofweek,
+                                future_idx.month]).astype(np.float32)
+    return future_idx, calendar
+
+def _horizon_frames(future_idx, villages, out, long):
+    # out holds periods x villages demand/solar arrays
+    n, periods = len(villages), len(future_idx)
+    if long:
+        return pd.DataFrame({'timestamp': np.tile(future_idx, n),
+                             'village': np.repeat(np.array(villages, dtype=object), periods),
+                             'demand': out['demand'].T.ravel(), 'solar': out['solar'].T.ravel()})
+    return {v: pd.DataFrame({'timestamp': future_idx, 'village': v,
+                             'demand': out['demand'][:, i], 'solar': out['solar'][:, i]})
+            for i, v in enumerate(villages)}
+
+@profiled("forecast.recursive")
+def forecast_horizon_recursive(df, models, villages, horizon_hours=24, res_minutes=60, long=False):
+    """Multi-step forecast for many villages with lag features fed back recursively.
+
+    Calendar features are built once for the shared future index. At every step the
+    feature rows of all villages are stacked and each target is predicted in one call
+    through a compact_forest.ForestStack; the predicted demand and solar become the
+    next step's lag1 / solar_lag1 (seeded with each village's last observation, or its
+    mean scaled by the fleet's current level when it has none). Returns {village: frame} like forecast_horizon, or one long frame with long=True.
+    """
+    from compact_forest import forest_stack
+    future_idx, calendar = _future_calendar(df, horizon_hours, res_minutes)
+    periods = len(future_idx)
+    villages = list(villages)
+    n = len(villages)
+    last = df.sort_values('timestamp').groupby('village').last()
+    fallback = {'demand': float(df['demand'].mean()), 'solar': float(df['solar'].mean())}
+    ratio = _fleet_lag_ratio(df)
+    lag = {}
+    mean = {}
+    for kind in ('demand', 'solar'):
+        mean[kind] = np.array([models[v]['mean_' + kind] if models.get(v) else fallback[kind]
+                               for v in villages])
+        seed = last[kind].reindex(villages).to_numpy(dtype=float) if kind in last else np.full(n, np.nan)
+        lag[kind] = np.where(np.isnan(seed), ratio[kind] * mean[kind], seed)
+    stacks = {}
+    for kind in ('demand', 'solar'):
+        # built once per models object (persisted inside a CompactModelStore)
+        stack = forest_stack(models, kind)
+        have = [i for i, v in enumerate(villages) if v in stack.index]
+        if have:
+            stacks[kind] = (np.array(have), stack, np.array([stack.index[villages[i]] for i in have]))
+    out = {kind: np.empty((periods, n)) for kind in ('demand', 'solar')}
+    X = np.empty((n, len(FEATURES)), dtype=np.float32)
+    for t in range(periods):
+        X[:, :4] = calendar[t]
+        X[:, 4] = lag['demand']
+        X[:, 5] = lag['solar']
+        for kind in ('demand', 'solar'):
+            pred = mean[kind].copy()
+            if kind in stacks:
+                rows, stack, members = stacks[kind]
+                pred[rows] = stack.predict(X[rows], members).clip(min=0)
+            out[kind][t] = pred
+        lag['demand'] = out['demand'][t]
+        lag['solar'] = out['solar'][t]
+    return _horizon_frames(future_idx, villages, out, long)
+
+GLOBAL_MODEL_FILE = "enershift_rf_global.joblib"
+GLOBAL_FEATURES = ['hour', 'minute', 'dow', 'month', 'lag1_norm', 'solar_lag1_norm',
+                   'log_mean_demand', 'solar_ratio']
+GLOBAL_RF_PARAMS = dict(n_estimators=80, min_samples_leaf=5, max_features=0.6, random_state=42)
+GLOBAL_MAX_SAMPLES = 200_000  # bootstrap rows per tree, keeps fit time flat as the fleet grows
+_EPS = 1e-6
+
+def village_scales(df):
+    """Per-village mean demand and solar; targets and lags are divided by these."""
+    scales = df.groupby('village')[['demand', 'solar']].mean()
+    return scales.rename(columns={'demand': 'mean_demand', 'solar': 'mean_solar'}).fillna(0.0)
+
+def _fleet_lag_ratio(df):
+    """{kind: mean over villages of reading / village mean at the last timestamp of `df`}.
+
+    Seeds the lags of villages without history, so they start from the fleet's current
+    level (dark at night) instead of their mean whatever the hour.
+    """
+    ratio = {'demand': 1.0, 'solar': 1.0}
+    if df.empty:
+        return ratio
+    scales = village_scales(df)
+    now = df[df['timestamp'] == df['timestamp'].max()]
+    for kind in ratio:
+        r = now[kind].to_numpy(dtype=float) / (scales['mean_' + kind].reindex(now['village']).to_numpy() + _EPS)
+        if not np.isnan(r).all():
+            ratio[kind] = float(np.nanmean(r))
+    return ratio
+
+def _village_attributes(scales, attributes=None):
+    att = pd.DataFrame({'log_mean_demand': np.log1p(scales['mean_demand']),
+                        'solar_ratio': scales['mean_solar'] / (scales['mean_demand'] + _EPS)},
+                       index=scales.index)
+    if attributes is not None:
+        att = att.join(attributes.select_dtypes('number'), how='left')
+    return att
+
+def _global_matrix(calendar, lag_demand, lag_solar, sc, att):
+    # calendar n x 4, per-row lags, sc n x 2 (mean demand, mean solar) and attributes
+    return np.column_stack([calendar, lag_demand / (sc[:, 0] + _EPS), lag_solar / (sc[:, 1] + _EPS),
+                            att]).astype(np.float32)
+
+@profiled("forecast.train_global", rows=len)
+def fit_global(df, attributes=None, n_jobs=-1):
+    """One multi-output forest for demand and solar across every village.
+
+    Rows of all villages are stacked; lags and targets are normalised by the village's
+    mean demand / solar, and village attributes (log mean demand, solar-to-demand ratio
+    and any numeric columns of `attributes`, indexed by village) are extra features, so
+    a village with little history borrows the shape learnt from the rest of the fleet.
+    """
+    d = _make_features(df.sort_values(['village', 'timestamp']).reset_index(drop=True))
+    scales = village_scales(d)
+    att = _village_attributes(scales, attributes)
+    rows = d['village']
+    sc = scales.loc[rows].to_numpy()
+    X = _global_matrix(d[['hour', 'minute', 'dow', 'month']].to_numpy(), d['lag1'].fillna(0).to_numpy(),
+                       d['solar_lag1'].to_numpy(), sc, att.loc[rows].fillna(0).to_numpy())
+    y = np.column_stack([d['demand'] / (sc[:, 0] + _EPS), d['solar'].fillna(0) / (sc[:, 1] + _EPS)])
+    rf = RandomForestRegressor(n_jobs=n_jobs, max_samples=min(1.0, GLOBAL_MAX_SAMPLES / max(len(d), 1)),
+                               **GLOBAL_RF_PARAMS)
+    rf.fit(X, y)
+    return {'kind': 'global', 'model': rf, 'scales': scales, 'attributes': att,
+            'features': GLOBAL_FEATURES + list(att.columns[2:])}
+
+def train_or_load_global(df, attributes=None, force_retrain=False):
+    if (not force_retrain) and os.path.exists(GLOBAL_MODEL_FILE):
+        try:
+            return joblib.load(GLOBAL_MODEL_FILE)
+        except Exception:
+            pass
+    model = fit_global(df, attributes)
+    joblib.dump(model, GLOBAL_MODEL_FILE)
+    return model
+
+@profiled("forecast.global")
+def forecast_horizon_global(df, model, villages, horizon_hours=24, res_minutes=60, long=False):
+    """Recursive multi-step forecast from a fit_global model.
+
+    Each step predicts demand and solar for every village in one call; predictions
+    become the next step's lags (seeded with each village's last observation, or with
+    the fleet's normalised lags at the last timestamp times its scales). Villages
+    the model has not seen are scaled by their own history in `df`, or by the mean
+    scales of the training fleet when `df` has none. Returns the same shapes as
+    forecast_horizon_recursive.
+    """
+    future_idx, calendar = _future_calendar(df, horizon_hours, res_minutes)
+    periods = len(future_idx)
+    villages = list(villages)
+    n = len(villages)
+    scales = model['scales'].reindex(villages)
+    unseen = scales['mean_demand'].isna()
+    if unseen.any():
+        own = village_scales(df[df['village'].isin(scales.index[unseen])])
+        scales = scales.fillna(own.reindex(villages)).fillna(model['scales'].mean())
+    att = _village_attributes(scales)
+    extra = model['attributes'].columns[2:]
+    if len(extra):
+        att = att.join(model['attributes'][extra].reindex(villages))
+    att = att.fillna(0).to_numpy()
+    last = df.sort_values('timestamp').groupby('village').last().reindex(villages)
+    ratio = _fleet_lag_ratio(df)
+    lag_demand = last['demand'].fillna(scales['mean_demand'] * ratio['demand']).to_numpy(dtype=float)
+    lag_solar = last['solar'].fillna(scales['mean_solar'] * ratio['solar']).to_numpy(dtype=float)
+    sc = scales.to_numpy()
+    out = {kind: np.empty((periods, n)) for kind in ('demand', 'solar')}
+    for t in range(periods):
+        X = _global_matrix(np.broadcast_to(calendar[t], (n, 4)), lag_demand, lag_solar, sc, att)
+        pred = model['model'].predict(X).reshape(n, 2).clip(min=0) * (sc + _EPS)
+        lag_demand = out['demand'][t] = pred[:, 0]
+        lag_solar = out['solar'][t] = pred[:, 1]
+    return _horizon_frames(future_idx, villages, out, long)
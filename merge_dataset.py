@@ -1,33 +1,119 @@
 import pandas as pd
+from datastore import STORE_DIR, write_store
 
-# Load datasets
-gen = pd.read_csv("Plant_1_Generation_Data.csv")
-weather = pd.read_csv("Plant_1_Weather_Sensor_Data.csv")
-
-# Convert timestamp to datetime
-gen['DATE_TIME'] = pd.to_datetime(gen['DATE_TIME'])
-weather['DATE_TIME'] = pd.to_datetime(weather['DATE_TIME'])
-
-# Merge on timestamp
-merged = pd.merge_asof(
-    gen.sort_values('DATE_TIME'),
-    weather.sort_values('DATE_TIME'),
-    on="DATE_TIME",
-    direction="nearest"
-)
-
-# Create simplified dataset
-final = pd.DataFrame()
-final["Timestamp"] = merged["DATE_TIME"]
-final["Solar (kW)"] = merged["AC_POWER"]
-
-# Approximate Wind power (scale wind speed)
-final["Wind (kW)"] = merged["WIND_SPEED"] * 2.5  
-
-# Simulate demand (solar + wind influence + base load)
-final["Demand (kW)"] = (final["Solar (kW)"] * 0.6 +
-                        final["Wind (kW)"] * 0.8 + 50).round(2)
-
-# Save
-final.to_csv("enershift_real.csv", index=False)
-print("enershift_real.csv created successfully!")
+GEN_FILE = "Plant_1_Generation_Data.csv"
+WEATHER_FILE = "Plant_1_Weather_Sensor_Data.csv"
+OUT_FILE = "enershift_real.csv"
+
+def derive_columns(merged):
+    # Create simplified dataset
+    final = pd.DataFrame()
+    final["Timestamp"] = merged["DATE_TIME"]
+    final["Solar (kW)"] = merged["AC_POWER"]
+
+    # Approximate Wind power (scale wind speed)
+    final["Wind (kW)"] = merged["WIND_SPEED"] * 2.5
+
+    # Simulate demand (solar + wind influence + base load)
+    final["Demand (kW)"] = (final["Solar (kW)"] * 0.6 +
+                            final["Wind (kW)"] * 0.8 + 50).round(2)
+    return final
+
+def _plant_power(gen):
+    # one row per timestamp: AC power summed over the plant's inverters (SOURCE_KEY)
+    return gen.groupby('DATE_TIME', as_index=False, sort=True)['AC_POWER'].sum()
+
+def merge_plant(gen_path=GEN_FILE, weather_path=WEATHER_FILE, out_path=OUT_FILE):
+    """Plant generation joined to the nearest weather reading, one row per timestamp with
+    AC power summed over the inverters; stream_merge writes the same rows in chunks."""
+    # Load datasets
+    gen = pd.read_csv(gen_path)
+    weather = pd.read_csv(weather_path)
+
+    # Convert timestamp to datetime
+    gen['DATE_TIME'] = pd.to_datetime(gen['DATE_TIME'])
+    weather['DATE_TIME'] = pd.to_datetime(weather['DATE_TIME'])
+
+    # Merge on timestamp (plant total across inverters)
+    merged = pd.merge_asof(
+        _plant_power(gen),
+        weather.sort_values('DATE_TIME'),
+        on="DATE_TIME",
+        direction="nearest"
+    )
+
+    # Save
+    derive_columns(merged).to_csv(out_path, index=False)
+    return out_path
+
+def _chunks(path, chunksize, date_format):
+    for chunk in pd.read_csv(path, chunksize=chunksize):
+        chunk['DATE_TIME'] = pd.to_datetime(chunk['DATE_TIME'], format=date_format)
+        yield chunk.sort_values('DATE_TIME', kind='stable')
+
+def stream_merge(gen_path=GEN_FILE, weather_path=WEATHER_FILE, out_dir=STORE_DIR,
+                 plant="1", chunksize=500_000, date_format=None):
+    """Chunked version of merge_plant for inputs too large to load at once; the stored
+    solar/wind/demand equal merge_plant's Solar/Wind/Demand rows (as float32).
+
+    Both files must be time-ordered (as SCADA exports are); each chunk is sorted and
+    must not start before the previous one ended. Generation rows are summed over the
+    inverters per DATE_TIME, so the store holds one plant-level row per timestamp; the
+    last timestamp of a chunk is carried into the next one, as its inverters may be
+    split across the boundary. The weather side is held as a small rolling buffer that
+    always reaches past the current generation chunk, so the nearest-timestamp join is
+    exact across chunk boundaries. Each chunk is appended to the datastore layout
+    (village=<plant>/month=YYYY-MM Parquet with timestamp/solar/wind/demand columns).
+    Peak memory depends on `chunksize`, not on the input size. Returns the number of
+    rows written.
+    """
+    weather_iter = _chunks(weather_path, chunksize, date_format)
+    wbuf = None
+    exhausted = False
+    last_time = None
+    carry = None
+    written = 0
+
+    def write(rows):
+        final = derive_columns(pd.merge_asof(rows, wbuf, on="DATE_TIME", direction="nearest"))
+        write_store(pd.DataFrame({'timestamp': final["Timestamp"], 'village': plant,
+                                  'solar': final["Solar (kW)"], 'wind': final["Wind (kW)"],
+                                  'demand': final["Demand (kW)"]}), out_dir)
+        return len(final)
+
+    for gen in _chunks(gen_path, chunksize, date_format):
+        if gen.empty:
+            continue
+        if last_time is not None and gen['DATE_TIME'].iloc[0] < last_time:
+            raise ValueError(f"{gen_path} is not time-ordered around {last_time}")
+        gen = _plant_power(gen if carry is None else pd.concat([carry, gen], ignore_index=True))
+        gmax = gen['DATE_TIME'].iloc[-1]
+        # make sure the buffer reaches past the chunk end so "nearest" can look ahead
+        while not exhausted and (wbuf is None or wbuf['DATE_TIME'].iloc[-1] < gmax):
+            try:
+                nxt = next(weather_iter)
+            except StopIteration:
+                exhausted = True
+                break
+            if wbuf is not None and not nxt.empty and nxt['DATE_TIME'].iloc[0] < wbuf['DATE_TIME'].iloc[-1]:
+                raise ValueError(f"{weather_path} is not time-ordered")
+            wbuf = nxt if wbuf is None else pd.concat([wbuf, nxt], ignore_index=True)
+        if wbuf is None or wbuf.empty:
+            raise ValueError(f"no weather rows in {weather_path}")
+        carry = gen.iloc[-1:]
+        if len(gen) > 1:
+            written += write(gen.iloc[:-1])
+        # later generation rows are >= gmax: keep the last weather time <= gmax onwards
+        times = wbuf['DATE_TIME'].to_numpy()
+        i = times.searchsorted(gmax.to_datetime64(), side='right') - 1
+        if i > 0:
+            start = times.searchsorted(times[i], side='left')
+            wbuf = wbuf.iloc[start:].reset_index(drop=True)
+        last_time = gmax
+    if carry is not None:
+        written += write(carry)
+    return written
+
+if __name__ == "__main__":
+    merge_plant()
+    print("enershift_real.csv created successfully!")
@@ -0,0 +1,125 @@
+# model_registry.py
+import hashlib
+import json
+import os
+import re
+import sys
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime, timezone
+import joblib
+import pandas as pd
+from forecast import FEATURES, MIN_TRAIN_ROWS, RF_PARAMS, fit_village
+
+REGISTRY_DIR = "enershift_models"
+MANIFEST_FILE = "manifest.json"
+TRAIN_COLUMNS = ['timestamp', 'demand', 'solar']
+
+def village_fingerprint(grp):
+    """Hash of a village's training rows plus the model settings that produced its artifact."""
+    g = grp[[c for c in TRAIN_COLUMNS if c in grp.columns]].sort_values('timestamp')
+    h = hashlib.sha256(pd.util.hash_pandas_object(g, index=False).values.tobytes())
+    h.update(json.dumps({'features': FEATURES, 'min_rows': MIN_TRAIN_ROWS, 'rf': RF_PARAMS},
+                        sort_keys=True).encode())
+    return h.hexdigest()
+
+def _artifact_name(vid, fingerprint):
+    safe = re.sub(r'[^A-Za-z0-9_.-]', '_', str(vid))
+    return f"{safe}-{fingerprint[:12]}.joblib"
+
+def _train_and_store(vid, grp, fingerprint, directory, n_jobs):
+    model = fit_village(grp, n_jobs=n_jobs)
+    name = _artifact_name(vid, fingerprint)
+    joblib.dump(model, os.path.join(directory, name))
+    return vid, model, {
+        'village': vid if isinstance(vid, (int, str)) else str(vid),
+        'fingerprint': fingerprint,
+        'artifact': name,
+        'rows': int(len(grp)),
+        'trained_at': datetime.now(timezone.utc).isoformat(timespec='seconds'),
+    }
+
+class ModelRegistry:
+    """One model artifact per village, tracked in a JSON manifest keyed by village."""
+
+    def __init__(self, directory=REGISTRY_DIR):
+        self.directory = directory
+        self.manifest_path = os.path.join(directory, MANIFEST_FILE)
+        self.manifest = {}
+        if os.path.exists(self.manifest_path):
+            with open(self.manifest_path) as fh:
+                self.manifest = json.load(fh)
+
+    def _save_manifest(self):
+        tmp = self.manifest_path + '.tmp'
+        with open(tmp, 'w') as fh:
+            json.dump(self.manifest, fh, indent=2, sort_keys=True)
+        os.replace(tmp, self.manifest_path)
+
+    def status(self, df=None):
+        """Manifest as a frame; with `df`, also whether each village's artifact is current."""
+        rows = [dict(entry) for entry in self.manifest.values()]
+        if df is not None:
+            known = {str(v): village_fingerprint(g) for v, g in df.groupby('village')}
+            for r in rows:
+                r['current'] = known.get(str(r['village'])) == r['fingerprint']
+            for key in known.keys() - self.manifest.keys():
+                rows.append({'village': key, 'fingerprint': None, 'artifact': None, 'rows': 0,
+                             'trained_at': None, 'current': False})
+        cols = ['village', 'rows', 'trained_at', 'fingerprint', 'artifact'] + (['current'] if df is not None else [])
+        return pd.DataFrame(rows, columns=cols)
+
+    def stale(self, df):
+        """Villages in `df` whose data or model settings no longer match their artifact."""
+        out = []
+        for vid, grp in df.groupby('village'):
+            entry = self.manifest.get(str(vid))
+            fp = village_fingerprint(grp)
+            if entry is None or entry['fingerprint'] != fp or \
+                    not os.path.exists(os.path.join(self.directory, entry['artifact'])):
+                out.append((vid, grp, fp))
+        return out
+
+    def load(self, vid):
+        entry = self.manifest[str(vid)]
+        return joblib.load(os.path.join(self.directory, entry['artifact']))
+
+    def train_or_load(self, df, workers=None, force_retrain=False):
+        """Retrain only stale villages (in parallel) and return the full {village: model} dict."""
+        os.makedirs(self.directory, exist_ok=True)
+        if force_retrain:
+            todo = [(vid, grp, village_fingerprint(grp)) for vid, grp in df.groupby('village')]
+        else:
+            todo = self.stale(df)
+        models = {}
+        if todo:
+            if workers == 1 or len(todo) == 1:
+                results = [_train_and_store(vid, grp, fp, self.directory, -1) for vid, grp, fp in todo]
+            else:
+                # one village per worker process; each forest trains single-threaded
+                with ProcessPoolExecutor(max_workers=workers) as pool:
+                    futures = [pool.submit(_train_and_store, vid, grp, fp, self.directory, 1)
+                               for vid, grp, fp in todo]
+                    results = [f.result() for f in futures]
+            for vid, model, entry in results:
+                old = self.manifest.get(str(vid))
+                self.manifest[str(vid)] = entry
+                models[vid] = model
+                if old and old['artifact'] != entry['artifact']:
+                    try:
+                        os.remove(os.path.join(self.directory, old['artifact']))
+                    except OSError:
+                        pass
+            self._save_manifest()
+        for vid in df['village'].unique():
+            if vid not in models:
+                models[vid] = self.load(vid)
+        return models
+
+def train_or_load_registry(df, directory=REGISTRY_DIR, workers=None, force_retrain=False):
+    """Registry-backed counterpart of forecast.train_or_load_models."""
+    return ModelRegistry(directory).train_or_load(df, workers=workers, force_retrain=force_retrain)
+
+if __name__ == "__main__":
+    # python model_registry.py [registry_dir]  -> print which models are stored
+    registry = ModelRegistry(sys.argv[1] if len(sys.argv) > 1 else REGISTRY_DIR)
+    print(registry.status().to_string(index=False))
@@ -0,0 +1,123 @@
+# network.py
+import numpy as np
+import pandas as pd
+from scipy import sparse
+from scipy.sparse.csgraph import connected_components
+from scipy.optimize import linprog
+from simulator import SOC_SHARE_THRESHOLD, _stack_forecasts, local_fleet_arrays
+
+FLOW_EPSILON = 1e-6  # per-kW cost on line flow, stops zero-loss loops from circulating power
+
+class VillageNetwork:
+    """Feeder graph between villages as sparse incidence matrices.
+
+    `edges` has from/to/capacity_kw and optional loss (fraction lost in transit). Each
+    line can carry power either way, so it becomes two directed arcs.
+    """
+
+    def __init__(self, villages, edges):
+        self.villages = [str(v) for v in villages]
+        pos = {v: i for i, v in enumerate(self.villages)}
+        edges = pd.DataFrame(edges)
+        src = edges['from'].astype(str).map(pos)
+        dst = edges['to'].astype(str).map(pos)
+        if src.isna().any() or dst.isna().any():
+            raise KeyError("edges reference villages that are not in the fleet")
+        loss = edges['loss'].to_numpy(dtype=float) if 'loss' in edges else np.zeros(len(edges))
+        cap = edges['capacity_kw'].to_numpy(dtype=float)
+        self.arc_from = np.concatenate([src, dst]).astype(int)
+        self.arc_to = np.concatenate([dst, src]).astype(int)
+        self.capacity = np.concatenate([cap, cap])
+        self.efficiency = 1.0 - np.concatenate([loss, loss])
+        n, m = len(self.villages), len(self.arc_from)
+        arcs = np.arange(m)
+        out_inc = sparse.csr_matrix((np.ones(m), (self.arc_from, arcs)), shape=(n, m))
+        in_inc = sparse.csr_matrix((self.efficiency, (self.arc_to, arcs)), shape=(n, m))
+        # node i: received_i + sent_i - delivered_to_i <= own surplus_i
+        self.A_ub = sparse.hstack([sparse.identity(n, format='csr'), out_inc - in_inc], format='csr')
+        self.cost = np.concatenate([-np.ones(n), np.full(m, FLOW_EPSILON)])
+        # separate feeder clusters never exchange power, so idle clusters are dropped per solve
+        adjacency = sparse.csr_matrix((np.ones(m), (self.arc_from, self.arc_to)), shape=(n, n))
+        _, self.component = connected_components(adjacency, directed=False)
+
+    def solve(self, surplus, deficit):
+        """Max-delivery transfers for one timestep; returns (received per village, flow per arc)."""
+        n, m = len(self.villages), len(self.capacity)
+        live = np.intersect1d(self.component[surplus > 0], self.component[deficit > 0])
+        nodes = np.flatnonzero(np.isin(self.component, live))
+        arcs = np.flatnonzero(np.isin(self.component[self.arc_from], live))
+        received, flow = np.zeros(n), np.zeros(m)
+        if len(nodes) == 0:
+            return received, flow
+        keep = np.concatenate([nodes, n + arcs])
+        A_ub = self.A_ub[nodes][:, keep] if len(keep) < n + m else self.A_ub
+        bounds = np.zeros((len(keep), 2))
+        bounds[:len(nodes), 1] = deficit[nodes]
+        bounds[len(nodes):, 1] = self.capacity[arcs]
+        res = linprog(self.cost[keep], A_ub=A_ub, b_ub=surplus[nodes], bounds=bounds, method='highs')
+        if res.status != 0:
+            raise RuntimeError(f"network sharing LP failed: {res.message}")
+        x = np.maximum(res.x, 0.0)
+        received[nodes] = np.minimum(x[:len(nodes)], deficit[nodes])
+        flow[arcs] = x[len(nodes):]
+        return received, flow
+
+def share_network_arrays(network, solar, demand, battery_soc, net_import):
+    """Network counterpart of simulator.share_pool_arrays (timesteps x villages inputs).
+
+    Only villages with SOC at the sharing threshold export surplus, as in the pool
+    rule, but transfers follow the feeder graph within line capacities and losses.
+    Timesteps without both exporters and deficits skip the solve. Returns the sharing
+    columns plus arc flows as a (timesteps x arcs) sparse matrix.
+    """
+    surplus = np.maximum(0.0, np.asarray(solar, dtype=float) - np.asarray(demand, dtype=float))
+    deficit = np.maximum(0.0, np.asarray(net_import, dtype=float))
+    gated = np.where(np.asarray(battery_soc) >= SOC_SHARE_THRESHOLD, surplus, 0.0)
+    received = np.zeros_like(deficit)
+    rows, cols, vals = [], [], []
+    for t in np.flatnonzero((gated.sum(axis=1) > 0) & (deficit.sum(axis=1) > 0)):
+        received[t], flow = network.solve(gated[t], deficit[t])
+        nz = np.flatnonzero(flow > 1e-9)
+        rows.append(np.full(len(nz), t))
+        cols.append(nz)
+        vals.append(flow[nz])
+    flows = sparse.csr_matrix((np.concatenate(vals) if vals else np.zeros(0),
+                               (np.concatenate(rows) if rows else np.zeros(0, int),
+                                np.concatenate(cols) if cols else np.zeros(0, int))),
+                              shape=(len(deficit), len(network.capacity)))
+    return {'surplus': surplus, 'deficit': deficit, 'received_from_pool': received,
+            'net_import_after_share': np.asarray(net_import, dtype=float) - received}, flows
+
+def simulate_multi_village_network(forecasts, edges, battery_kwh=100, battery_pmax_kw=50, min_soc_frac=0.2,
+                                   critical_fraction=0.25, dt_hours=1.0):
+    """simulate_multi_village with capacity- and loss-aware sharing over a feeder graph.
+
+    Returns ({village: frame}, flows) where the frames carry the usual columns, with
+    received_from_pool now the power delivered over the network, and flows lists every
+    non-zero arc flow as timestamp/from/to/flow_kw/delivered_kw.
+    """
+    villages = list(forecasts.keys())
+    frames, demand, solar = _stack_forecasts(forecasts)
+    network = VillageNetwork(villages, edges)
+    cols = local_fleet_arrays(demand, solar, battery_kwh=battery_kwh, battery_pmax_kw=battery_pmax_kw,
+                              min_soc_frac=min_soc_frac, critical_fraction=critical_fraction,
+                              dt_hours=dt_hours)
+    shared, flow_matrix = share_network_arrays(network, cols['solar'], cols['demand'],
+                                               cols['battery_soc'], cols['net_import_kw'])
+    cols.update(shared)
+    final_dfs = {}
+    for i, v in enumerate(villages):
+        df = pd.DataFrame({'timestamp': frames[i]['timestamp']})
+        for c, arr in cols.items():
+            df[c] = arr[:, i]
+        final_dfs[v] = df
+    coo = flow_matrix.tocoo()
+    timestamps = frames[0]['timestamp'].to_numpy()
+    flows = pd.DataFrame({
+        'timestamp': timestamps[coo.row],
+        'from': np.array(network.villages, dtype=object)[network.arc_from[coo.col]],
+        'to': np.array(network.villages, dtype=object)[network.arc_to[coo.col]],
+        'flow_kw': coo.data,
+        'delivered_kw': coo.data * network.efficiency[coo.col],
+    }).sort_values(['timestamp', 'from', 'to']).reset_index(drop=True)
+    return final_dfs, flows
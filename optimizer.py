@@ -1,7 +1,11 @@
 # optimizer.py
 import pandas as pd
 import numpy as np
+from scipy import sparse
+from scipy.optimize import linprog
+from profiling import count, profiled
 
+@profiled("dispatch.loop", rows=len)
 def optimize_storage(forecast_df, battery_kwh=100, battery_pmax_kw=50, min_soc_frac=0.2,
                      dt_hours=1.0, critical_fraction=0.25):
     df = forecast_df.copy().reset_index(drop=True)
@@ -49,3 +53,250 @@ def optimize_storage(forecast_df, battery_kwh=100, battery_pmax_kw=50, min_soc_f
             'served_noncritical_kw': round(max(0.0, served_noncritical),3)
         })
     return pd.DataFrame(records)
+
+SCHEDULE_COLUMNS = ['timestamp', 'demand', 'solar', 'battery_soc', 'charge_kw', 'discharge_kw',
+                    'net_import_kw', 'served_critical_kw', 'served_noncritical_kw']
+
+def _dispatch_step(d, s, soc, cap, inv_cap, pmax, min_soc, dt_hours):
+    # one timestep of the optimize_storage rules over a vector of villages; updates soc in place
+    # use solar to supply demand first
+    used_solar = np.minimum(s, d)
+    remaining = d - used_solar
+    # battery discharge to cover remaining (respect pmax and SOC)
+    max_discharge_kwh = np.maximum(0.0, (soc - min_soc) * cap)
+    discharge_kw = np.minimum(np.minimum(pmax, max_discharge_kwh / dt_hours), remaining)
+    soc -= discharge_kw * dt_hours * inv_cap
+    net_import = np.maximum(0.0, remaining - discharge_kw)
+    # leftover solar can charge battery
+    leftover_solar = np.maximum(0.0, s - used_solar)
+    max_charge_kwh = (1.0 - soc) * cap
+    charge_kw = np.minimum(np.minimum(pmax, max_charge_kwh / dt_hours), leftover_solar)
+    soc += charge_kw * dt_hours * inv_cap
+    np.clip(soc, 0.0, 1.0, out=soc)
+    return used_solar, charge_kw, discharge_kw, net_import
+
+@profiled("dispatch.arrays", rows=np.size)
+def dispatch_arrays(demand, solar, battery_kwh=100, battery_pmax_kw=50, min_soc_frac=0.2,
+                    dt_hours=1.0, critical_fraction=0.25, initial_soc=0.6):
+    """Array version of the optimize_storage rules.
+
+    `demand` and `solar` are 1-D (timesteps) or 2-D (villages x timesteps). Battery
+    parameters may be scalars or per-village arrays. Returns a dict of unrounded
+    arrays with the same shape as `demand`.
+    """
+    demand = np.asarray(demand, dtype=float)
+    solar = np.broadcast_to(np.asarray(solar, dtype=float), demand.shape)
+    single = demand.ndim == 1
+    if single:
+        demand, solar = demand[None, :], solar[None, :]
+    n_villages, n_steps = demand.shape
+    cap = np.broadcast_to(np.asarray(battery_kwh, dtype=float), (n_villages,))
+    pmax = np.broadcast_to(np.asarray(battery_pmax_kw, dtype=float), (n_villages,))
+    min_soc = np.broadcast_to(np.asarray(min_soc_frac, dtype=float), (n_villages,))
+    crit_frac = np.broadcast_to(np.asarray(critical_fraction, dtype=float), (n_villages,))
+    has_cap = cap > 0
+    inv_cap = np.divide(1.0, cap, out=np.zeros(n_villages), where=has_cap)
+    soc = np.broadcast_to(np.asarray(initial_soc, dtype=float), (n_villages,)).copy()
+    # outputs are filled one timestep (column) at a time; keep them timestep-major
+    out = {k: np.empty((n_steps, n_villages)) for k in
+           ('battery_soc', 'charge_kw', 'discharge_kw', 'net_import_kw', 'served_critical_kw')}
+    for t in range(n_steps):
+        d = demand[:, t]
+        used_solar, charge_kw, discharge_kw, net_import = _dispatch_step(
+            d, solar[:, t], soc, cap, inv_cap, pmax, min_soc, dt_hours)
+        out['battery_soc'][t] = soc
+        out['charge_kw'][t] = charge_kw
+        out['discharge_kw'][t] = discharge_kw
+        out['net_import_kw'][t] = net_import
+        out['served_critical_kw'][t] = np.minimum(d * crit_frac, used_solar + discharge_kw)
+    result = {k: v.T for k, v in out.items()}
+    result['served_noncritical_kw'] = np.maximum(
+        0.0, demand - result['served_critical_kw'] - result['net_import_kw'])
+    result['demand'] = demand
+    result['solar'] = solar
+    if single:
+        result = {k: v[0] for k, v in result.items()}
+    return result
+
+def _schedule_frame(timestamps, res, i=None):
+    pick = (lambda a: a) if i is None else (lambda a: a[i])
+    df = pd.DataFrame({
+        'timestamp': timestamps,
+        'demand': pick(res['demand']),
+        'solar': pick(res['solar']),
+        'battery_soc': np.round(pick(res['battery_soc']), 4),
+    })
+    for col in SCHEDULE_COLUMNS[4:]:
+        df[col] = np.round(pick(res[col]), 3)
+    return df
+
+def optimize_storage_vectorized(forecast_df, battery_kwh=100, battery_pmax_kw=50, min_soc_frac=0.2,
+                                dt_hours=1.0, critical_fraction=0.25):
+    """Drop-in replacement for optimize_storage backed by dispatch_arrays."""
+    df = forecast_df.reset_index(drop=True)
+    solar = df['solar'].to_numpy(dtype=float) if 'solar' in df.columns else 0.0
+    res = dispatch_arrays(df['demand'].to_numpy(dtype=float), solar, battery_kwh=battery_kwh,
+                          battery_pmax_kw=battery_pmax_kw, min_soc_frac=min_soc_frac,
+                          dt_hours=dt_hours, critical_fraction=critical_fraction)
+    return _schedule_frame(df['timestamp'], res)
+
+def optimize_fleet(forecasts, battery_kwh=100, battery_pmax_kw=50, min_soc_frac=0.2,
+                   dt_hours=1.0, critical_fraction=0.25):
+    """Dispatch every village in `forecasts` (dict of frames on a shared index) in one call."""
+    villages = list(forecasts.keys())
+    frames = [forecasts[v].reset_index(drop=True) for v in villages]
+    demand = np.vstack([f['demand'].to_numpy(dtype=float) for f in frames])
+    solar = np.vstack([f['solar'].to_numpy(dtype=float) if 'solar' in f.columns
+                       else np.zeros(len(f)) for f in frames])
+    res = dispatch_arrays(demand, solar, battery_kwh=battery_kwh, battery_pmax_kw=battery_pmax_kw,
+                          min_soc_frac=min_soc_frac, dt_hours=dt_hours,
+                          critical_fraction=critical_fraction)
+    return {v: _schedule_frame(frames[i]['timestamp'], res, i)
+            for i, v in enumerate(villages)}
+
+# variable blocks of one MPC window, each `horizon` long:
+# u solar->load, c solar->battery, x battery->load, g grid import, q critical import, e stored kWh
+_MPC_BLOCKS = ('u', 'c', 'x', 'g', 'q', 'e')
+
+def _mpc_structure(horizon, dt_hours, critical_weight):
+    # constraint matrices depend only on the window length, so they are built once and
+    # reused; each window only changes right-hand sides and bounds
+    H = horizon
+    I = sparse.identity(H, format='csr')
+    Z = sparse.csr_matrix((H, H))
+    blk = dict(zip(_MPC_BLOCKS, range(len(_MPC_BLOCKS))))
+    # e_t - e_{t-1} - dt*c_t + dt*x_t = 0 (e_{-1} moves to the rhs)
+    shift = sparse.eye(H, k=-1, format='csr')
+    balance = [I, Z, I, I, Z, Z]                                   # u + x + g = demand
+    dynamics = [Z, -dt_hours * I, dt_hours * I, Z, Z, I - shift]
+    solar_cap = [I, I, Z, Z, Z, Z]                                 # u + c <= solar
+    critical = [-I, Z, -I, Z, -I, Z]                               # u + x + q >= critical
+    A_eq = sparse.vstack([sparse.hstack(balance), sparse.hstack(dynamics)], format='csr')
+    A_ub = sparse.vstack([sparse.hstack(solar_cap), sparse.hstack(critical)], format='csr')
+    cost = np.zeros(len(_MPC_BLOCKS) * H)
+    cost[blk['g'] * H:(blk['g'] + 1) * H] = 1.0
+    cost[blk['q'] * H:(blk['q'] + 1) * H] = critical_weight
+    # tiny throughput cost so the solver does not cycle the battery for nothing
+    cost[blk['c'] * H:(blk['x'] + 1) * H] = 1e-6
+    bounds = np.zeros((len(_MPC_BLOCKS) * H, 2))
+    bounds[:, 1] = np.inf
+    return A_eq, A_ub, cost, bounds
+
+MPC_VILLAGES_PER_LP = 16  # villages solved together as one block-diagonal LP per window
+MPC_FLEET_COMMIT = 4      # steps applied per window by optimize_fleet_mpc before re-planning
+
+def _mpc_group_structure(horizon, n_villages, dt_hours, critical_weight):
+    # one village's window repeated down the diagonal; villages share no constraint,
+    # so each block's optimum is the one its own LP would find
+    A_eq, A_ub, cost, bounds = _mpc_structure(horizon, dt_hours, critical_weight)
+    if n_villages == 1:
+        return A_eq, A_ub, cost
+    return (sparse.block_diag([A_eq] * n_villages, format='csr'),
+            sparse.block_diag([A_ub] * n_villages, format='csr'), np.tile(cost, n_villages))
+
+@profiled("dispatch.mpc", rows=lambda d: np.size(d))
+def mpc_arrays(demand, solar, battery_kwh=100, battery_pmax_kw=50, min_soc_frac=0.2, dt_hours=1.0,
+               critical_fraction=0.25, horizon_steps=24, commit_steps=1, critical_weight=10.0,
+               villages_per_lp=MPC_VILLAGES_PER_LP):
+    """Receding-horizon LP dispatch on arrays, shaped like dispatch_arrays' inputs/outputs.
+
+    `demand` and `solar` are 1-D (timesteps) or 2-D (villages x timesteps). Up to
+    `villages_per_lp` villages are solved per window as one block-diagonal LP built from
+    the cached single-village matrices, so a fleet costs one HiGHS call per window and
+    group instead of one per village. Returns a dict of unrounded arrays.
+    """
+    demand = np.asarray(demand, dtype=float)
+    solar = np.broadcast_to(np.asarray(solar, dtype=float), demand.shape)
+    single = demand.ndim == 1
+    if single:
+        demand, solar = demand[None, :], solar[None, :]
+    n_villages, n = demand.shape
+    cap = float(battery_kwh)
+    pmax = float(battery_pmax_kw)
+    nb = len(_MPC_BLOCKS)
+    plan = {k: np.zeros((n_villages, n)) for k in _MPC_BLOCKS}
+    structures = {}
+    for g0 in range(0, n_villages, villages_per_lp):
+        rows = slice(g0, min(g0 + villages_per_lp, n_villages))
+        V = rows.stop - rows.start
+        e = np.full(V, 0.6 * cap)  # start SOC fraction, as optimize_storage
+        t0 = 0
+        while t0 < n:
+            H = min(horizon_steps, n - t0)
+            if (H, V) not in structures:
+                structures[H, V] = _mpc_group_structure(H, V, dt_hours, critical_weight)
+            A_eq, A_ub, cost = structures[H, V]
+            d = demand[rows, t0:t0 + H]
+            p = solar[rows, t0:t0 + H]
+            e0 = np.zeros((V, H))
+            e0[:, 0] = e
+            b_eq = np.concatenate([d, e0], axis=1).ravel()
+            b_ub = np.concatenate([p, -d * critical_fraction], axis=1).ravel()
+            bounds = np.zeros((V, nb, H, 2))
+            bounds[..., 1] = np.inf
+            bounds[:, 1:3, :, 1] = pmax
+            bounds[:, 5, :, 0] = np.minimum(min_soc_frac * cap, e)[:, None]
+            bounds[:, 5, :, 1] = cap
+            res = linprog(cost, A_ub=A_ub, b_ub=b_ub, A_eq=A_eq, b_eq=b_eq,
+                          bounds=bounds.reshape(-1, 2), method='highs')
+            count("dispatch.mpc_solves")
+            if res.status != 0:
+                raise RuntimeError(f"MPC window at step {t0} (villages {rows.start}-{rows.stop - 1}) "
+                                   f"failed: {res.message}")
+            k = min(commit_steps, H)
+            x = res.x.reshape(V, nb, H)
+            for j, name in enumerate(_MPC_BLOCKS):
+                plan[name][rows, t0:t0 + k] = x[:, j, :k]
+            e = plan['e'][rows, t0 + k - 1]
+            t0 += k
+    for name in _MPC_BLOCKS[:-1]:
+        plan[name] = np.maximum(plan[name], 0.0)  # drop solver round-off below zero
+    soc = plan['e'] / cap if cap > 0 else np.full(demand.shape, 0.6)
+    served_critical = np.minimum(demand * critical_fraction, plan['u'] + plan['x'])
+    result = {'demand': demand, 'solar': solar, 'battery_soc': np.clip(soc, 0.0, 1.0),
+              'charge_kw': plan['c'], 'discharge_kw': plan['x'], 'net_import_kw': plan['g'],
+              'served_critical_kw': served_critical,
+              'served_noncritical_kw': np.maximum(0.0, demand - served_critical - plan['g'])}
+    if single:
+        result = {k: v[0] for k, v in result.items()}
+    return result
+
+def optimize_storage_mpc(forecast_df, battery_kwh=100, battery_pmax_kw=50, min_soc_frac=0.2,
+                         dt_hours=1.0, critical_fraction=0.25, horizon_steps=24, commit_steps=1,
+                         critical_weight=10.0):
+    """Receding-horizon LP dispatch with the same schedule columns as optimize_storage.
+
+    Each window of `horizon_steps` is solved as a sparse LP with HiGHS (minimise grid
+    import, with unserved critical load weighted by `critical_weight`) subject to SOC
+    dynamics, pmax, min SOC and charging from solar only; the first `commit_steps`
+    are applied and the window moves on. Unlike the greedy rule it can hold charge
+    for a later deficit. Use optimize_fleet_mpc for many villages.
+    """
+    df = forecast_df.reset_index(drop=True)
+    solar = df['solar'].to_numpy(dtype=float) if 'solar' in df.columns else np.zeros(len(df))
+    res = mpc_arrays(df['demand'].to_numpy(dtype=float), solar, battery_kwh=battery_kwh,
+                     battery_pmax_kw=battery_pmax_kw, min_soc_frac=min_soc_frac, dt_hours=dt_hours,
+                     critical_fraction=critical_fraction, horizon_steps=horizon_steps,
+                     commit_steps=commit_steps, critical_weight=critical_weight)
+    return _schedule_frame(df['timestamp'], res)
+
+def optimize_fleet_mpc(forecasts, battery_kwh=100, battery_pmax_kw=50, min_soc_frac=0.2,
+                       dt_hours=1.0, critical_fraction=0.25, horizon_steps=24, commit_steps=MPC_FLEET_COMMIT,
+                       critical_weight=10.0, villages_per_lp=MPC_VILLAGES_PER_LP):
+    """optimize_storage_mpc for every village in `forecasts` (dict of frames on a shared index).
+
+    Villages are solved in block-diagonal groups. The default commits MPC_FLEET_COMMIT
+    steps per window rather than 1: a fleet re-plans every few hours instead of every
+    hour, for a fraction of the solves (pass commit_steps=1 to match optimize_storage_mpc).
+    """
+    villages = list(forecasts.keys())
+    frames = [forecasts[v].reset_index(drop=True) for v in villages]
+    demand = np.vstack([f['demand'].to_numpy(dtype=float) for f in frames])
+    solar = np.vstack([f['solar'].to_numpy(dtype=float) if 'solar' in f.columns
+                       else np.zeros(len(f)) for f in frames])
+    res = mpc_arrays(demand, solar, battery_kwh=battery_kwh, battery_pmax_kw=battery_pmax_kw,
+                     min_soc_frac=min_soc_frac, dt_hours=dt_hours, critical_fraction=critical_fraction,
+                     horizon_steps=horizon_steps, commit_steps=commit_steps,
+                     critical_weight=critical_weight, villages_per_lp=villages_per_lp)
+    return {v: _schedule_frame(frames[i]['timestamp'], res, i)
+            for i, v in enumerate(villages)}
@@ -0,0 +1,296 @@
+# pipeline.py
+import argparse
+import hashlib
+import json
+import os
+import queue
+import threading
+import time
+import joblib
+import pandas as pd
+from model_registry import ModelRegistry
+from forecast import fit_global, forecast_horizon_global, forecast_horizon_recursive
+from optimizer import optimize_storage_vectorized
+from simulator import share_pool_arrays
+from ai_suggestions import fleet_recommendations
+from datastore import load_store, source_fingerprint
+
+WORK_DIR = "enershift_pipeline"
+STAGES = ('ingest', 'train', 'forecast', 'dispatch', 'share', 'recommend')
+FORECAST_BATCH = 256  # villages per batched forecast call
+OUTPUTS = {'ingest': 'history.parquet', 'train': None, 'forecast': 'forecasts.parquet',
+           'dispatch': 'local_schedules.parquet', 'share': 'schedules.parquet', 'recommend': 'alerts.csv'}
+
+def _digest(obj):
+    return hashlib.sha1(json.dumps(obj, sort_keys=True, default=str).encode()).hexdigest()[:16]
+
+def load_source(path):
+    """History as a long timestamp/village/demand/solar(/wind) frame from a CSV shaped like
+    enershift_data.csv (village "1" when there is no village column) or a datastore directory."""
+    if os.path.isdir(path):
+        df = load_store(path)
+        df['village'] = df['village'].astype(str)
+        return df
+    df = pd.read_csv(path).rename(columns={'DATE_TIME': 'timestamp'})
+    df['timestamp'] = pd.to_datetime(df['timestamp'])
+    df['village'] = df['village'].astype(str) if 'village' in df.columns else "1"
+    return df
+
+def _prefetch(items, depth):
+    # yield from `items` while a background thread produces up to `depth` items ahead
+    q = queue.Queue(maxsize=max(1, depth))
+    done = object()
+    failed = []
+
+    def produce():
+        try:
+            for item in items:
+                q.put(item)
+        except BaseException as exc:
+            failed.append(exc)
+        finally:
+            q.put(done)
+    worker = threading.Thread(target=produce, daemon=True)
+    worker.start()
+    while True:
+        item = q.get()
+        if item is done:
+            break
+        yield item
+    worker.join()
+    if failed:
+        raise failed[0]
+
+class Pipeline:
+    """ingest -> train -> forecast -> dispatch -> share -> recommend with checkpoints.
+
+    Every stage has a fingerprint chained from its upstream stage and its own
+    parameters; outputs and fingerprints are recorded in `work_dir`/manifest.json, so a
+    rerun resumes at the first stage whose fingerprint changed or whose output is
+    missing. When forecast and dispatch both need to run, villages are forecast on a
+    background thread and dispatched as they arrive. `model` is "village" (one forest
+    pair per village, via the model registry) or "global" (one pooled forest).
+    """
+
+    def __init__(self, source, work_dir=WORK_DIR, horizon_hours=24, res_minutes=60, battery_kwh=100,
+                 battery_pmax_kw=50, min_soc_frac=0.2, critical_fraction=0.25, workers=None, prefetch=8,
+                 top_n=None, model="village"):
+        self.source = source
+        self.model = model
+        self.work_dir = work_dir
+        self.workers = workers
+        self.prefetch = prefetch
+        self.dispatch_params = dict(battery_kwh=battery_kwh, battery_pmax_kw=battery_pmax_kw,
+                                    min_soc_frac=min_soc_frac, critical_fraction=critical_fraction,
+                                    dt_hours=res_minutes / 60)
+        self.params = {'ingest': {'source': source_fingerprint(source)}, 'train': {'model': model},
+                       'forecast': {'horizon_hours': horizon_hours, 'res_minutes': res_minutes},
+                       'dispatch': self.dispatch_params, 'share': {}, 'recommend': {'top_n': top_n}}
+        self.fingerprints = {}
+        prev = None
+        for name in STAGES:
+            prev = self.fingerprints[name] = _digest([prev, name, self.params[name]])
+        self.manifest_path = os.path.join(work_dir, "manifest.json")
+        self.manifest = {}
+        if os.path.exists(self.manifest_path):
+            with open(self.manifest_path) as f:
+                self.manifest = json.load(f)
+        self.stats = {}
+        self._data = {}
+
+    def _path(self, name):
+        return os.path.join(self.work_dir, OUTPUTS[name]) if OUTPUTS[name] else None
+
+    def fresh(self, name):
+        entry = self.manifest.get(name)
+        if not entry or entry['fingerprint'] != self.fingerprints[name]:
+            return False
+        if name == 'train':
+            return os.path.exists(self._model_path())
+        return os.path.exists(self._path(name))
+
+    def first_stale(self, force=None):
+        for i, name in enumerate(STAGES):
+            if name == force or not self.fresh(name):
+                return i
+        return len(STAGES)
+
+    def _save(self, name, data):
+        path = self._path(name)
+        if path is None:
+            return
+        tmp = path + ".tmp"
+        if path.endswith(".csv"):
+            data.to_csv(tmp, index=False)
+        else:
+            data.to_parquet(tmp, index=False)
+        os.replace(tmp, path)
+
+    def _commit(self, name):
+        self.manifest[name] = {'fingerprint': self.fingerprints[name], 'finished': time.time()}
+        tmp = self.manifest_path + ".tmp"
+        with open(tmp, "w") as f:
+            json.dump(self.manifest, f, indent=2)
+        os.replace(tmp, self.manifest_path)
+
+    def get(self, name):
+        """Output of a stage: in memory if it ran in this process, else from its checkpoint
+        (load time is added to a cached stage's seconds)."""
+        if name not in self._data:
+            t0 = time.perf_counter()
+            if name == 'train':
+                self._data[name] = self._models(train=False)
+            elif name == 'recommend':
+                self._data[name] = pd.read_csv(self._path(name))
+            else:
+                self._data[name] = pd.read_parquet(self._path(name))
+            if name in self.stats:
+                self.stats[name]['seconds'] += time.perf_counter() - t0
+        return self._data[name]
+
+    def _record(self, name, status, seconds, rows):
+        self.stats[name] = {'status': status, 'seconds': seconds, 'rows': int(rows),
+                            'rows_per_s': rows / seconds if status == 'ran' and seconds > 0 else None}
+
+    def _model_path(self):
+        return os.path.join(self.work_dir, "global_model.joblib" if self.model == "global" else "models")
+
+    def _models(self, train=True):
+        if self.model == "global":
+            if not train:
+                return joblib.load(self._model_path())
+            model = fit_global(self.get('ingest'))
+            joblib.dump(model, self._model_path())
+            return model
+        registry = ModelRegistry(self._model_path())
+        if train:
+            return registry.train_or_load(self.get('ingest'), workers=self.workers)
+        return {vid: registry.load(vid) for vid in registry.manifest}
+
+    def _forecast_villages(self, villages, busy):
+        history = self.get('ingest')
+        models = self.get('train')
+        p = self.params['forecast']
+        forecast = forecast_horizon_global if self.model == "global" else forecast_horizon_recursive
+        for i in range(0, len(villages), FORECAST_BATCH):
+            t0 = time.perf_counter()
+            batch = forecast(history, models, villages[i:i + FORECAST_BATCH],
+                             horizon_hours=p['horizon_hours'], res_minutes=p['res_minutes'])
+            busy['forecast'] += time.perf_counter() - t0
+            yield from batch.items()
+
+    def _dispatch(self, fc):
+        sched = optimize_storage_vectorized(fc, **self.dispatch_params)
+        sched.insert(1, 'village', fc['village'].astype(str).to_numpy())
+        return sched
+
+    def _run_forecast_dispatch(self, run_dispatch):
+        villages = list(pd.unique(self.get('ingest')['village']))
+        busy = {'forecast': 0.0, 'dispatch': 0.0}
+        forecasts, local = [], []
+        t0 = time.perf_counter()
+        stream = self._forecast_villages(villages, busy)
+        for vid, fc in (_prefetch(stream, self.prefetch) if run_dispatch else stream):
+            forecasts.append(fc)
+            if run_dispatch:
+                t1 = time.perf_counter()
+                local.append(self._dispatch(fc))
+                busy['dispatch'] += time.perf_counter() - t1
+        wall = time.perf_counter() - t0
+        self._data['forecast'] = pd.concat(forecasts, ignore_index=True)
+        self._save('forecast', self._data['forecast'])
+        self._commit('forecast')
+        self._record('forecast', 'ran', busy['forecast'], len(self._data['forecast']))
+        if run_dispatch:
+            self._data['dispatch'] = pd.concat(local, ignore_index=True)
+            self._save('dispatch', self._data['dispatch'])
+            self._commit('dispatch')
+            self._record('dispatch', 'ran', busy['dispatch'], len(self._data['dispatch']))
+            self.stats['forecast+dispatch'] = {'status': 'overlapped', 'seconds': wall,
+                                               'rows': len(self._data['dispatch']), 'rows_per_s': None}
+
+    def _run_stage(self, name):
+        if name == 'ingest':
+            return load_source(self.source)
+        if name == 'train':
+            return self._models()
+        if name == 'dispatch':
+            fc = self.get('forecast')
+            return pd.concat([self._dispatch(g) for _, g in fc.groupby('village', sort=False)],
+                             ignore_index=True)
+        if name == 'share':
+            local = self.get('dispatch')
+            villages = pd.unique(local['village'])
+            shape = (len(villages), -1)
+            cols = {c: local[c].to_numpy(dtype=float).reshape(shape).T
+                    for c in ('solar', 'demand', 'battery_soc', 'net_import_kw')}
+            shared = share_pool_arrays(cols['solar'], cols['demand'], cols['battery_soc'], cols['net_import_kw'])
+            out = local.copy()
+            for c, arr in shared.items():
+                out[c] = arr.T.ravel()
+            return out
+        if name == 'recommend':
+            return fleet_recommendations(self.get('share'), self.get('forecast'),
+                                         top_n=self.params['recommend']['top_n'])
+        raise KeyError(name)
+
+    def run(self, force=None, until='recommend'):
+        """Run every stale stage up to `until`; `force` reruns from that stage onwards."""
+        os.makedirs(self.work_dir, exist_ok=True)
+        start = self.first_stale(force)
+        last = STAGES.index(until)
+        for i, name in enumerate(STAGES[:last + 1]):
+            if i < start:
+                self._record(name, 'cached', 0.0, 0)
+                continue
+            if name in self.stats:  # already produced by the overlapped forecast/dispatch run
+                continue
+            if name == 'forecast':
+                self._run_forecast_dispatch(run_dispatch=last >= STAGES.index('dispatch'))
+                continue
+            t0 = time.perf_counter()
+            out = self._run_stage(name)
+            elapsed = time.perf_counter() - t0
+            self._data[name] = out
+            self._save(name, out)
+            self._commit(name)
+            self._record(name, 'ran', elapsed, len(self.get('ingest')) if name == 'train' else len(out))
+        return self.stats
+
+def format_report(stats):
+    lines = [f"{'stage':<18} {'status':<10} {'seconds':>9} {'rows':>10} {'rows/s':>12}"]
+    for name, s in stats.items():
+        rate = f"{s['rows_per_s']:,.0f}" if s['rows_per_s'] else "-"
+        lines.append(f"{name:<18} {s['status']:<10} {s['seconds']:9.3f} {s['rows']:10,} {rate:>12}")
+    return "\n".join(lines)
+
+if __name__ == "__main__":
+    ap = argparse.ArgumentParser(description="EnerShift batch pipeline: ingest, train, forecast, dispatch, "
+                                             "share and recommend with resumable checkpoints")
+    ap.add_argument("--source", default="enershift_data.csv", help="history CSV or datastore directory")
+    ap.add_argument("--work-dir", default=WORK_DIR)
+    ap.add_argument("--horizon", type=int, default=24, help="forecast hours")
+    ap.add_argument("--res-minutes", type=int, default=60)
+    ap.add_argument("--battery-kwh", type=float, default=100)
+    ap.add_argument("--battery-pmax-kw", type=float, default=50)
+    ap.add_argument("--min-soc", type=float, default=0.2)
+    ap.add_argument("--critical-fraction", type=float, default=0.25)
+    ap.add_argument("--workers", type=int, default=None, help="training processes")
+    ap.add_argument("--prefetch", type=int, default=8, help="villages forecast ahead of dispatch")
+    ap.add_argument("--top-n", type=int, default=None, help="keep alerts of the N most critical villages")
+    ap.add_argument("--model", choices=("village", "global"), default="village",
+                    help="per-village forests or one pooled model for the fleet")
+    ap.add_argument("--force", choices=STAGES, help="rerun from this stage even if its checkpoint is fresh")
+    ap.add_argument("--until", choices=STAGES, default='recommend')
+    args = ap.parse_args()
+    pipe = Pipeline(args.source, work_dir=args.work_dir, horizon_hours=args.horizon,
+                    res_minutes=args.res_minutes, battery_kwh=args.battery_kwh,
+                    battery_pmax_kw=args.battery_pmax_kw, min_soc_frac=args.min_soc,
+                    critical_fraction=args.critical_fraction, workers=args.workers,
+                    prefetch=args.prefetch, top_n=args.top_n, model=args.model)
+    t0 = time.perf_counter()
+    stats = pipe.run(force=args.force, until=args.until)
+    print(format_report(stats))
+    print(f"total {time.perf_counter() - t0:.3f}s, outputs in {args.work_dir}/")
+    with open(os.path.join(args.work_dir, "report.json"), "w") as f:
+        json.dump(stats, f, indent=2)
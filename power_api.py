@@ -0,0 +1,257 @@
+# power_api.py
+import hashlib
+import json
+import os
+import threading
+import time
+from collections import OrderedDict
+import pandas as pd
+import requests
+from profiling import count, stage
+
+POWER_DAILY_URL = "https://power.larc.nasa.gov/api/temporal/daily/point"
+DEFAULT_PARAMETERS = ("ALLSKY_SFC_SW_DWN", "WS10M")
+CACHE_DIR = os.environ.get("ENERSHIFT_POWER_CACHE", ".power_cache")
+OFFLINE_DIR = os.environ.get("ENERSHIFT_POWER_OFFLINE")
+OFFLINE_REDATE = os.environ.get("ENERSHIFT_POWER_OFFLINE_REDATE", "") not in ("", "0")
+CACHE_TTL_SECONDS = 6 * 3600
+COORD_DECIMALS = 2  # ~1 km, well below the 0.5 degree POWER grid
+
+def make_query(lat, lon, start, end, parameters=DEFAULT_PARAMETERS, community="RE"):
+    """Normalised POWER query; coordinates are rounded so nearby points share a cache entry."""
+    return {
+        "latitude": round(float(lat), COORD_DECIMALS),
+        "longitude": round(float(lon), COORD_DECIMALS),
+        "parameters": ",".join(sorted(parameters)),
+        "community": community,
+        "start": str(start),
+        "end": str(end),
+    }
+
+def query_key(query):
+    raw = json.dumps(query, sort_keys=True)
+    return hashlib.sha1(raw.encode()).hexdigest()
+
+class HttpBackend:
+    """Live NASA POWER daily endpoint with a reused HTTP session."""
+
+    def __init__(self, url=POWER_DAILY_URL, timeout=30):
+        self.url = url
+        self.timeout = timeout
+        self.session = requests.Session()
+
+    def get(self, query):
+        params = dict(query, format="JSON")
+        response = self.session.get(self.url, params=params, timeout=self.timeout)
+        response.raise_for_status()
+        return response.json()
+
+class OfflineBackend:
+    """Serves recorded responses from `directory` instead of the network.
+
+    An exact query match is served first; otherwise the recording of the same date
+    range and parameters closest to the requested location is used. Recordings of other
+    dates are only served with `redate=True` (ENERSHIFT_POWER_OFFLINE_REDATE=1): the
+    nearest recording covering the same number of days has its days relabelled as the
+    requested ones and `redated_from` set to its original range. Anything else raises
+    FileNotFoundError rather than returning weather for the wrong dates.
+    """
+
+    def __init__(self, directory, redate=False):
+        self.directory = directory
+        self.redate = redate
+
+    def _recordings(self):
+        if not os.path.isdir(self.directory):
+            return
+        for name in sorted(os.listdir(self.directory)):
+            if name.endswith(".json"):
+                with open(os.path.join(self.directory, name)) as fh:
+                    yield json.load(fh)
+
+    @staticmethod
+    def _days(start, end):
+        return [d.strftime("%Y%m%d") for d in pd.date_range(pd.to_datetime(start, format="%Y%m%d"),
+                                                            pd.to_datetime(end, format="%Y%m%d"))]
+
+    def _redated(self, rec, query):
+        q = rec["query"]
+        mapping = dict(zip(self._days(q["start"], q["end"]), self._days(query["start"], query["end"])))
+        payload = dict(rec["payload"], redated_from=[q["start"], q["end"]])
+        props = dict(payload["properties"])
+        props["parameter"] = {name: {mapping[k]: v for k, v in values.items() if k in mapping}
+                              for name, values in props["parameter"].items()}
+        payload["properties"] = props
+        return payload
+
+    def get(self, query):
+        path = os.path.join(self.directory, query_key(query) + ".json")
+        if os.path.exists(path):
+            with open(path) as fh:
+                return json.load(fh)["payload"]
+        n_days = len(self._days(query["start"], query["end"]))
+        best, best_dist = None, None
+        for rec in self._recordings():
+            q = rec["query"]
+            if q["parameters"] != query["parameters"]:
+                continue
+            same_range = (q["start"], q["end"]) == (query["start"], query["end"])
+            if not same_range and not (self.redate and len(self._days(q["start"], q["end"])) == n_days):
+                continue
+            # a recording of the requested dates always beats a re-dated one
+            dist = (not same_range,
+                    (q["latitude"] - query["latitude"]) ** 2 + (q["longitude"] - query["longitude"]) ** 2)
+            if best_dist is None or dist < best_dist:
+                best, best_dist = rec, dist
+        if best is None:
+            raise FileNotFoundError(f"no recorded POWER response for {query['start']}-{query['end']} "
+                                    f"({query}) in {self.directory}")
+        return best["payload"] if not best_dist[0] else self._redated(best, query)
+
+    def save(self, query, payload):
+        os.makedirs(self.directory, exist_ok=True)
+        path = os.path.join(self.directory, query_key(query) + ".json")
+        with open(path, "w") as fh:
+            json.dump({"query": query, "payload": payload}, fh)
+
+# another thread or process sharing the directory may remove a file first
+def _remove(path):
+    try:
+        os.remove(path)
+    except OSError:
+        pass
+
+def _mtime(path):
+    try:
+        return os.path.getmtime(path)
+    except OSError:
+        return 0.0
+
+class PowerCache:
+    """Two-level TTL cache: an in-process LRU over a size-bounded directory of JSON files."""
+
+    def __init__(self, directory=CACHE_DIR, ttl_seconds=CACHE_TTL_SECONDS, max_disk_entries=256,
+                 max_memory_entries=32):
+        self.directory = directory
+        self.ttl = ttl_seconds
+        self.max_disk_entries = max_disk_entries
+        self.max_memory_entries = max_memory_entries
+        self._memory = OrderedDict()
+        self._lock = threading.Lock()  # Streamlit sessions share one cache across threads
+
+    def _path(self, key):
+        return os.path.join(self.directory, key + ".json")
+
+    def get(self, key):
+        now = time.time()
+        with self._lock:
+            hit = self._memory.get(key)
+            if hit is not None:
+                stored_at, payload = hit
+                if now - stored_at <= self.ttl:
+                    self._memory.move_to_end(key)
+                    return payload
+                del self._memory[key]
+        if self.directory is None:
+            return None
+        path = self._path(key)
+        try:
+            with open(path) as fh:
+                entry = json.load(fh)
+        except (OSError, ValueError):
+            return None
+        if now - entry["stored_at"] > self.ttl:
+            _remove(path)
+            return None
+        try:
+            os.utime(path)  # mtime doubles as the LRU clock for disk eviction
+        except OSError:
+            pass
+        self._remember(key, entry["stored_at"], entry["payload"])
+        return entry["payload"]
+
+    def put(self, key, payload):
+        now = time.time()
+        self._remember(key, now, payload)
+        if self.directory is None:
+            return
+        os.makedirs(self.directory, exist_ok=True)
+        tmp = f"{self._path(key)}.{os.getpid()}-{threading.get_ident()}.tmp"
+        with open(tmp, "w") as fh:
+            json.dump({"stored_at": now, "payload": payload}, fh)
+        os.replace(tmp, self._path(key))
+        self._evict_disk()
+
+    def _remember(self, key, stored_at, payload):
+        with self._lock:
+            self._memory[key] = (stored_at, payload)
+            self._memory.move_to_end(key)
+            while len(self._memory) > self.max_memory_entries:
+                self._memory.popitem(last=False)
+
+    def _evict_disk(self):
+        entries = [os.path.join(self.directory, n) for n in os.listdir(self.directory) if n.endswith(".json")]
+        if len(entries) <= self.max_disk_entries:
+            return
+        entries.sort(key=_mtime)
+        for path in entries[:len(entries) - self.max_disk_entries]:
+            _remove(path)
+
+    def clear(self):
+        with self._lock:
+            self._memory.clear()
+        if self.directory and os.path.isdir(self.directory):
+            for name in os.listdir(self.directory):
+                if name.endswith(".json"):
+                    _remove(os.path.join(self.directory, name))
+
+class PowerClient:
+    """Cached access to POWER daily point data through a pluggable backend."""
+
+    def __init__(self, backend=None, cache=None, record_dir=None):
+        if backend is None:
+            backend = OfflineBackend(OFFLINE_DIR, OFFLINE_REDATE) if OFFLINE_DIR else HttpBackend()
+        self.backend = backend
+        self.cache = cache if cache is not None else PowerCache()
+        self.recorder = OfflineBackend(record_dir) if record_dir else None
+
+    def fetch(self, lat, lon, start, end, parameters=DEFAULT_PARAMETERS, community="RE"):
+        query = make_query(lat, lon, start, end, parameters, community)
+        key = query_key(query)
+        payload = self.cache.get(key)
+        count("power.cache_hit" if payload is not None else "power.cache_miss")
+        if payload is None:
+            with stage("power.request"):
+                payload = self.backend.get(query)
+            self.cache.put(key, payload)
+            if self.recorder is not None:
+                self.recorder.save(query, payload)
+        return payload
+
+    def fetch_frame(self, lat, lon, start, end):
+        """Daily solar (ALLSKY_SFC_SW_DWN) and wind (WS10M) as a date/solar/wind frame."""
+        data = self.fetch(lat, lon, start, end)
+        return power_frame(data)
+
+def power_frame(data):
+    solar = data["properties"]["parameter"]["ALLSKY_SFC_SW_DWN"]
+    wind = data["properties"]["parameter"]["WS10M"]
+    df = pd.DataFrame({
+        "date": list(solar.keys()),
+        "solar": list(solar.values()),
+        "wind": [wind.get(k) for k in solar.keys()]
+    })
+    df["date"] = pd.to_datetime(df["date"])
+    return df
+
+_default_client = None
+
+def get_client():
+    """Process-wide client, so the in-memory cache survives Streamlit reruns."""
+    global _default_client
+    if _default_client is None:
+        _default_client = PowerClient()
+    return _default_client
+
+def fetch_power_frame(lat, lon, start, end):
+    return get_client().fetch_frame(lat, lon, start, end)
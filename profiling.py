@@ -0,0 +1,184 @@
+# profiling.py
+import cProfile
+import contextlib
+import functools
+import json
+import os
+import threading
+import time
+
+# off unless ENERSHIFT_PROFILE=1 or enable() is called; disabled stage() calls return a
+# shared no-op context, so instrumented hot paths pay one function call and a flag check
+ENABLED = os.environ.get("ENERSHIFT_PROFILE", "") not in ("", "0")
+
+_local = threading.local()
+_NULL = contextlib.nullcontext()
+
+class Collector:
+    """Stage timings and counters. One process-wide instance backs enable()/report();
+    begin() gives a thread its own, so concurrent app sessions do not mix."""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.stages = {}    # name -> [calls, total_s, max_s, rows]
+        self.villages = {}  # name -> {village: total_s}
+        self.folded = {}    # "outer;inner" -> self time (s), for flamegraph tools
+        self.counters = {}
+
+    def clear(self):
+        with self.lock:
+            self.stages.clear()
+            self.villages.clear()
+            self.folded.clear()
+            self.counters.clear()
+
+_global = Collector()
+
+def _active():
+    # this thread's collector, else the process-wide one when enabled
+    return getattr(_local, 'collector', None) or (_global if ENABLED else None)
+
+def enable(flag=True):
+    global ENABLED
+    ENABLED = bool(flag)
+
+def reset():
+    _global.clear()
+
+def begin(flag=True):
+    """Record this thread's stages into a fresh Collector (returned) until end(), whether
+    or not profiling is enabled process-wide; begin(False) records nothing for the thread
+    beyond the global setting. Stages run on other threads are not included."""
+    _local.collector = Collector() if flag else None
+    return _local.collector
+
+def end():
+    _local.collector = None
+
+class _Stage:
+    __slots__ = ('name', 'rows', 'village', 't0', 'child')
+
+    def __init__(self, name, rows, village):
+        self.name = name
+        self.rows = rows
+        self.village = village
+
+    def __enter__(self):
+        stack = getattr(_local, 'stack', None)
+        if stack is None:
+            stack = _local.stack = []
+        stack.append(self)
+        self.child = 0.0
+        self.t0 = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        elapsed = time.perf_counter() - self.t0
+        stack = _local.stack
+        path = ";".join(s.name for s in stack)
+        stack.pop()
+        if stack:
+            stack[-1].child += elapsed
+        c = _active()
+        if c is None:
+            return False
+        with c.lock:
+            st = c.stages.setdefault(self.name, [0, 0.0, 0.0, 0])
+            st[0] += 1
+            st[1] += elapsed
+            st[2] = max(st[2], elapsed)
+            st[3] += self.rows
+            if self.village is not None:
+                per = c.villages.setdefault(self.name, {})
+                per[self.village] = per.get(self.village, 0.0) + elapsed
+            c.folded[path] = c.folded.get(path, 0.0) + max(0.0, elapsed - self.child)
+        return False
+
+def stage(name, rows=0, village=None):
+    """Time a block: `with stage("forecast.train", rows=len(g), village=vid): ...`."""
+    if not ENABLED and getattr(_local, 'collector', None) is None:
+        return _NULL
+    return _Stage(name, rows, village)
+
+def count(name, n=1):
+    c = _active()
+    if c is not None:
+        with c.lock:
+            c.counters[name] = c.counters.get(name, 0) + n
+
+def profiled(name=None, rows=None, village=None):
+    """Decorator form of stage(); `rows` and `village` map the call's first argument to
+    a row count and a village id."""
+    def wrap(fn):
+        label = name or f"{fn.__module__}.{fn.__name__}"
+
+        @functools.wraps(fn)
+        def inner(*args, **kwargs):
+            if not ENABLED and getattr(_local, 'collector', None) is None:
+                return fn(*args, **kwargs)
+            first = args[0] if args else None
+            with _Stage(label, rows(first) if rows else 0, village(first) if village else None):
+                return fn(*args, **kwargs)
+        return inner
+    return wrap
+
+def report(collector=None):
+    """Structured snapshot: per-stage calls/total/mean/max/rows/rows_per_s, slowest first.
+    Reads the process-wide collector unless one from begin() is given."""
+    c = collector or _global
+    with c.lock:
+        stages = []
+        for name, (calls, total, worst, rows) in sorted(c.stages.items(), key=lambda kv: -kv[1][1]):
+            entry = {'stage': name, 'calls': calls, 'total_s': total, 'mean_s': total / calls,
+                     'max_s': worst, 'rows': rows, 'rows_per_s': rows / total if rows and total else None}
+            if name in c.villages:
+                slowest = sorted(c.villages[name].items(), key=lambda kv: -kv[1])
+                entry['villages'] = {str(v): t for v, t in slowest}
+            stages.append(entry)
+        return {'enabled': ENABLED or collector is not None, 'stages': stages, 'counters': dict(c.counters)}
+
+def save_report(path):
+    with open(path, "w") as f:
+        json.dump(report(), f, indent=2, default=str)
+
+def save_folded(path):
+    """Stage stacks in the folded format read by flamegraph.pl and speedscope (microseconds)."""
+    with _global.lock:
+        lines = [f"{k} {int(v * 1e6)}" for k, v in sorted(_global.folded.items()) if v > 0]
+    with open(path, "w") as f:
+        f.write("\n".join(lines) + "\n")
+
+@contextlib.contextmanager
+def profile_to(path):
+    """Run the block under cProfile and dump stats to `path` (snakeviz, pstats, gprof2dot)."""
+    prof = cProfile.Profile()
+    prof.enable()
+    try:
+        yield prof
+    finally:
+        prof.disable()
+        prof.dump_stats(path)
+
+if __name__ == "__main__":
+    # python profiling.py [--out DIR] script.py [args...]: run a script with stages enabled
+    # and write report.json, stages.folded and cprofile.prof
+    import argparse
+    import runpy
+    import sys
+    import profiling  # the instance the instrumented modules import, not __main__
+    ap = argparse.ArgumentParser(description="Run a script with EnerShift stage profiling")
+    ap.add_argument("--out", default="profile_out")
+    ap.add_argument("script")
+    ap.add_argument("args", nargs=argparse.REMAINDER)
+    opts = ap.parse_args()
+    os.makedirs(opts.out, exist_ok=True)
+    profiling.enable()
+    sys.argv = [opts.script] + opts.args
+    try:
+        with profiling.profile_to(os.path.join(opts.out, "cprofile.prof")):
+            runpy.run_path(opts.script, run_name="__main__")
+    finally:
+        profiling.save_report(os.path.join(opts.out, "report.json"))
+        profiling.save_folded(os.path.join(opts.out, "stages.folded"))
+        for s in profiling.report()['stages']:
+            print(f"{s['stage']:<22} {s['calls']:6d} calls {s['total_s']:9.3f}s")
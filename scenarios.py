@@ -0,0 +1,133 @@
+# scenarios.py
+import csv
+import itertools
+import os
+from multiprocessing import Pool, shared_memory
+import numpy as np
+from simulator import simulate_fleet_arrays, _stack_forecasts
+
+SIM_PARAMS = ('battery_kwh', 'battery_pmax_kw', 'min_soc_frac', 'critical_fraction')
+KPI_COLUMNS = ['total_import_kwh', 'unserved_critical_kwh', 'shared_kwh', 'min_soc', 'mean_final_soc']
+
+def parameter_grid(**values):
+    """Yield one scenario dict per combination, e.g. parameter_grid(battery_kwh=[50, 100], ...)."""
+    names = list(values)
+    for combo in itertools.product(*(values[n] for n in names)):
+        yield dict(zip(names, combo))
+
+def sample_scenarios(n, distributions, seed=0):
+    """Yield `n` Monte Carlo scenarios.
+
+    `distributions` maps a parameter to a (low, high) uniform range, a list of choices or
+    a callable taking a numpy Generator. Besides the simulator parameters, `demand_scale`,
+    `solar_scale` and `noise` (relative std of per-step noise) perturb the forecast, and
+    each scenario gets its own `seed` for that noise.
+    """
+    rng = np.random.default_rng(seed)
+    for i in range(n):
+        sc = {}
+        for name, dist in distributions.items():
+            if callable(dist):
+                sc[name] = dist(rng)
+            elif isinstance(dist, tuple):
+                sc[name] = float(rng.uniform(*dist))
+            else:
+                sc[name] = dist[rng.integers(len(dist))]
+        sc.setdefault('seed', int(seed) * 1_000_003 + i)
+        yield sc
+
+# per-process views of the shared forecast block, set by _attach
+_shared = {}
+
+def _attach(names, shape, dt_hours):
+    for key, name in names.items():
+        shm = shared_memory.SharedMemory(name=name)
+        arr = np.ndarray(shape, dtype=np.float64, buffer=shm.buf)
+        arr.flags.writeable = False
+        _shared[key] = (shm, arr)
+    _shared['dt_hours'] = dt_hours
+
+def _perturb(arr, scale, noise, rng):
+    if scale == 1.0 and not noise:
+        return arr
+    out = arr * scale
+    if noise:
+        out *= np.clip(1.0 + noise * rng.standard_normal(arr.shape), 0.0, None)
+    return out
+
+def _run_one(job):
+    idx, sc = job
+    demand = _shared['demand'][1]
+    solar = _shared['solar'][1]
+    dt = _shared['dt_hours']
+    rng = np.random.default_rng(sc.get('seed'))
+    noise = float(sc.get('noise', 0.0))
+    demand = _perturb(demand, float(sc.get('demand_scale', 1.0)), noise, rng)
+    solar = _perturb(solar, float(sc.get('solar_scale', 1.0)), noise, rng)
+    kwargs = {k: sc[k] for k in SIM_PARAMS if k in sc}
+    cols = simulate_fleet_arrays(demand, solar, dt_hours=dt, **kwargs)
+    critical = cols['demand'] * float(sc.get('critical_fraction', 0.25))
+    unserved = np.maximum(0.0, critical - cols['served_critical_kw'] - cols['received_from_pool'])
+    row = {'scenario': idx}
+    row.update(sc)
+    row.update({
+        'total_import_kwh': float(cols['net_import_after_share'].sum() * dt),
+        'unserved_critical_kwh': float(unserved.sum() * dt),
+        'shared_kwh': float(cols['received_from_pool'].sum() * dt),
+        'min_soc': float(cols['battery_soc'].min()),
+        'mean_final_soc': float(cols['battery_soc'][-1].mean()),
+    })
+    return row
+
+def run_scenarios(forecasts, scenarios, out_path, workers=None, dt_hours=1.0, chunksize=4):
+    """Run every scenario over the whole fleet and stream one KPI row per scenario to `out_path` (CSV).
+
+    The stacked forecast arrays are placed in shared memory once and mapped read-only
+    by each worker, so scenarios only carry their parameters. Rows are written as they
+    complete (unordered; the `scenario` column keeps the input position). Returns the
+    number of scenarios written.
+    """
+    _, demand, solar = _stack_forecasts(forecasts)
+    blocks = {}
+    try:
+        for key, arr in (('demand', demand), ('solar', solar)):
+            shm = shared_memory.SharedMemory(create=True, size=arr.nbytes)
+            np.ndarray(arr.shape, dtype=np.float64, buffer=shm.buf)[:] = arr
+            blocks[key] = shm
+        names = {k: shm.name for k, shm in blocks.items()}
+        shape = demand.shape
+        del demand, solar
+        jobs = enumerate(scenarios)
+        workers = workers or os.cpu_count() or 1
+        with open(out_path, 'w', newline='') as fh:
+            writer = None
+            if workers == 1:
+                _attach(names, shape, dt_hours)
+                rows = map(_run_one, jobs)
+                pool = None
+            else:
+                pool = Pool(workers, initializer=_attach,
+                            initargs=(names, shape, dt_hours))
+                rows = pool.imap_unordered(_run_one, jobs, chunksize=chunksize)
+            n = 0
+            try:
+                for row in rows:
+                    if writer is None:
+                        params = [k for k in row if k not in KPI_COLUMNS and k != 'scenario']
+                        writer = csv.DictWriter(fh, fieldnames=['scenario'] + params + KPI_COLUMNS,
+                                                extrasaction='ignore')
+                        writer.writeheader()
+                    writer.writerow(row)
+                    n += 1
+            finally:
+                if pool is not None:
+                    pool.close()
+                    pool.join()
+                else:
+                    for key in ('demand', 'solar'):
+                        _shared.pop(key)[0].close()
+        return n
+    finally:
+        for shm in blocks.values():
+            shm.close()
+            shm.unlink()
@@ -0,0 +1,131 @@
+# sharded.py
+import os
+from multiprocessing import Pool, shared_memory
+import numpy as np
+import pandas as pd
+from optimizer import SCHEDULE_COLUMNS, dispatch_arrays
+from simulator import (SOC_SHARE_THRESHOLD, _exclusive_cumprod, _first_partial, _pool_terms,
+                       _receive, _stack_forecasts)
+
+INPUTS = ('demand', 'solar')
+OUTPUTS = tuple(SCHEDULE_COLUMNS[3:]) + ('surplus', 'deficit', 'received_from_pool',
+                                         'net_import_after_share')
+
+# per-process {name: (SharedMemory, timesteps x villages view)}, set by _attach
+_shared = {}
+
+def _attach(names, shape, params):
+    for key, name in names.items():
+        shm = shared_memory.SharedMemory(name=name)
+        _shared[key] = (shm, np.ndarray(shape, dtype=np.float64, buffer=shm.buf))
+    _shared['params'] = params
+
+def _arr(key):
+    return _shared[key][1]
+
+def _dispatch_shard(cols):
+    # local dispatch for one shard of villages; returns its per-timestep pool contributions
+    a, b = cols
+    demand = _arr('demand')[:, a:b]
+    solar = _arr('solar')[:, a:b]
+    res = dispatch_arrays(demand.T, solar.T, **_shared['params'])
+    _arr('battery_soc')[:, a:b] = np.round(res['battery_soc'].T, 4)
+    for c in SCHEDULE_COLUMNS[4:]:
+        _arr(c)[:, a:b] = np.round(res[c].T, 3)
+    surplus = np.maximum(0.0, solar - demand)
+    deficit = np.maximum(0.0, _arr('net_import_kw')[:, a:b])
+    _arr('surplus')[:, a:b] = surplus
+    _arr('deficit')[:, a:b] = deficit
+    gated = np.where(_arr('battery_soc')[:, a:b] >= SOC_SHARE_THRESHOLD, surplus, 0.0)
+    return gated.sum(axis=1), deficit.sum(axis=1)
+
+def _shard_terms(job):
+    # second reduce: product of allocation factors and first partially-served position
+    (a, b), (r0, r1), pool_surplus, pool_deficit, offset = job
+    deficit = _arr('deficit')[r0:r1, a:b]
+    active, dtot, before, full, factor = _pool_terms(pool_surplus, pool_deficit, deficit, offset)
+    return factor.prod(axis=1), _first_partial(full, before)
+
+def _shard_allocate(job):
+    (a, b), (r0, r1), pool_surplus, pool_deficit, offset, carried_in, first_before = job
+    deficit = _arr('deficit')[r0:r1, a:b]
+    active, dtot, before, full, factor = _pool_terms(pool_surplus, pool_deficit, deficit, offset)
+    carried = _exclusive_cumprod(factor) * carried_in[:, None]
+    received = _receive(pool_surplus, deficit, active, dtot, before, full, carried, first_before)
+    _arr('received_from_pool')[r0:r1, a:b] = received
+    _arr('net_import_after_share')[r0:r1, a:b] = _arr('net_import_kw')[r0:r1, a:b] - received
+    return None
+
+def simulate_sharded_arrays(demand, solar, workers=None, block_steps=2048, battery_kwh=100,
+                            battery_pmax_kw=50, min_soc_frac=0.2, critical_fraction=0.25, dt_hours=1.0):
+    """simulate_fleet_arrays with villages sharded over worker processes.
+
+    `demand` and `solar` are villages x timesteps. Inputs and outputs live in shared
+    memory; each worker dispatches its own contiguous shard of villages. The pool step
+    is then a cross-shard reduce per block of `block_steps` timesteps: shards report
+    gated surplus and deficit totals, then allocation-factor products, and the driver
+    combines those (T-length vectors per shard) into the prefix each shard needs to
+    allocate its villages as the in-order loop would. Dispatch columns equal
+    simulate_fleet_arrays bit for bit; the pool allocation past the first shard boundary
+    can differ in the last bit, as shard products are multiplied in a different order.
+    Battery parameters are scalars. Returns timesteps x villages arrays like
+    simulate_fleet_arrays.
+    """
+    n_villages, n_steps = np.shape(demand)
+    workers = max(1, min(workers or os.cpu_count() or 1, n_villages))
+    bounds = np.linspace(0, n_villages, workers + 1).astype(int)
+    shards = [(int(a), int(b)) for a, b in zip(bounds[:-1], bounds[1:])]
+    params = dict(battery_kwh=battery_kwh, battery_pmax_kw=battery_pmax_kw, min_soc_frac=min_soc_frac,
+                  critical_fraction=critical_fraction, dt_hours=dt_hours)
+    shape = (n_steps, n_villages)
+    blocks = {}
+    try:
+        for key in INPUTS + OUTPUTS:
+            blocks[key] = shared_memory.SharedMemory(create=True, size=max(1, 8 * n_steps * n_villages))
+        names = {k: shm.name for k, shm in blocks.items()}
+        _attach(names, shape, params)
+        _arr('demand')[:] = np.asarray(demand, dtype=float).T
+        _arr('solar')[:] = np.asarray(solar, dtype=float).T
+        with Pool(workers, initializer=_attach, initargs=(names, shape, params)) as pool:
+            parts = pool.map(_dispatch_shard, shards)
+            gated = np.stack([p[0] for p in parts])      # shards x timesteps
+            shard_deficit = np.stack([p[1] for p in parts])
+            pool_surplus = gated.sum(axis=0)
+            pool_deficit = shard_deficit.sum(axis=0)
+            offsets = np.cumsum(shard_deficit, axis=0) - shard_deficit
+            for r0 in range(0, n_steps, block_steps):
+                r1 = min(r0 + block_steps, n_steps)
+                rows = slice(r0, r1)
+                common = [(cols, (r0, r1), pool_surplus[rows], pool_deficit[rows], offsets[k, rows])
+                          for k, cols in enumerate(shards)]
+                terms = pool.map(_shard_terms, common)
+                prods = np.stack([t[0] for t in terms])
+                carried = np.vstack([np.ones(r1 - r0), np.cumprod(prods, axis=0)[:-1]])
+                first_before = np.min([t[1] for t in terms], axis=0)
+                pool.map(_shard_allocate, [job + (carried[k], first_before)
+                                           for k, job in enumerate(common)])
+        return {k: _arr(k).copy() for k in INPUTS + OUTPUTS}
+    finally:
+        for key in list(_shared):
+            if key != 'params':
+                _shared.pop(key)[0].close()
+        for shm in blocks.values():
+            shm.unlink()
+
+def simulate_multi_village_sharded(forecasts, workers=None, block_steps=2048, battery_kwh=100,
+                                   battery_pmax_kw=50, min_soc_frac=0.2, critical_fraction=0.25,
+                                   dt_hours=1.0):
+    """Multi-process counterpart of simulate_multi_village_vectorized (same frames)."""
+    villages = list(forecasts.keys())
+    frames, demand, solar = _stack_forecasts(forecasts)
+    cols = simulate_sharded_arrays(demand, solar, workers=workers, block_steps=block_steps,
+                                   battery_kwh=battery_kwh, battery_pmax_kw=battery_pmax_kw,
+                                   min_soc_frac=min_soc_frac, critical_fraction=critical_fraction,
+                                   dt_hours=dt_hours)
+    final_dfs = {}
+    for i, v in enumerate(villages):
+        df = pd.DataFrame({'timestamp': frames[i]['timestamp']})
+        for c in SCHEDULE_COLUMNS[1:] + list(OUTPUTS[6:]):
+            df[c] = cols[c][:, i]
+        final_dfs[v] = df
+    return final_dfs
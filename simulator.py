@@ -1,8 +1,10 @@
 # simulator.py
 import pandas as pd
 import numpy as np
-from optimizer import optimize_storage
+from optimizer import optimize_storage, dispatch_arrays, SCHEDULE_COLUMNS
+from profiling import profiled
 
+@profiled("sharing.loop", rows=lambda f: sum(len(x) for x in f.values()))
 def simulate_multi_village(forecasts, battery_kwh=100, battery_pmax_kw=50, min_soc_frac=0.2,
                            critical_fraction=0.25, dt_hours=1.0):
     villages = list(forecasts.keys())
@@ -56,3 +58,116 @@ def simulate_multi_village(forecasts, battery_kwh=100, battery_pmax_kw=50, min_s
     # convert to DataFrames
     final_dfs = {v: pd.DataFrame(final[v]) for v in villages}
     return final_dfs
+
+SOC_SHARE_THRESHOLD = 0.95
+
+@profiled("sharing.pool", rows=np.size)
+def share_pool_arrays(solar, demand, battery_soc, net_import, block_rows=1024):
+    """Matrix form of the pool-sharing step in simulate_multi_village.
+
+    All inputs are timesteps x villages arrays taken from the local schedules. Every
+    timestep is allocated at once: the loop's running pool_surplus is rebuilt from an
+    exclusive cumulative sum of deficits (while the pool still covers full need) and an
+    exclusive cumulative product of (1 - deficit / pool_deficit) afterwards, so village
+    order is honoured exactly as in the loop. Rows are processed in blocks of
+    `block_rows` to bound temporary memory. Returns a dict of timesteps x villages arrays.
+    """
+    n_steps, n_villages = np.shape(demand)
+    dtype = np.result_type(solar, demand, battery_soc, net_import)
+    out = {k: np.empty((n_steps, n_villages), dtype=dtype)
+           for k in ('surplus', 'deficit', 'received_from_pool', 'net_import_after_share')}
+    for a in range(0, n_steps, block_rows):
+        b = min(a + block_rows, n_steps)
+        s = np.asarray(solar[a:b], dtype=float)
+        d = np.asarray(demand[a:b], dtype=float)
+        net = np.asarray(net_import[a:b], dtype=float)
+        surplus = np.maximum(0.0, s - d)
+        deficit = np.maximum(0.0, net)
+        gated = np.where(np.asarray(battery_soc[a:b]) >= SOC_SHARE_THRESHOLD, surplus, 0.0)
+        received = _allocate_pool(gated.sum(axis=1), deficit)
+        out['surplus'][a:b] = surplus
+        out['deficit'][a:b] = deficit
+        out['received_from_pool'][a:b] = received
+        out['net_import_after_share'][a:b] = net - received
+    return out
+
+def _pool_terms(pool_surplus, pool_deficit, deficit, offset=0.0):
+    # per-village pieces of the in-order allocation; `offset` is the deficit of villages
+    # that come before this block of columns (used when villages are sharded)
+    active = (pool_surplus > 0) & (pool_deficit > 0)
+    dtot = np.where(active, pool_deficit, 1.0)[:, None]
+    before = np.cumsum(deficit, axis=1) - deficit + np.reshape(offset, (-1, 1))
+    # while the remaining pool exceeds total deficit each village takes its full need
+    full = (pool_surplus[:, None] - before) > dtot
+    factor = np.where(full | ~active[:, None], 1.0, 1.0 - deficit / dtot)
+    return active, dtot, before, full, factor
+
+def _exclusive_cumprod(factor):
+    carried = np.ones_like(factor)
+    np.cumprod(factor[:, :-1], axis=1, out=carried[:, 1:])
+    return carried
+
+def _first_partial(full, before):
+    # deficit ahead of the first village that no longer gets its full need (inf if none)
+    return np.where(full, np.inf, before).min(axis=1)
+
+def _receive(pool_surplus, deficit, active, dtot, before, full, carried, first_before):
+    s_first = np.where(np.isfinite(first_before), pool_surplus - first_before, 0.0)
+    remaining = np.where(full, pool_surplus[:, None] - before, s_first[:, None] * carried)
+    received = np.minimum(deficit, remaining * (deficit / dtot))
+    received[~active] = 0.0
+    return received
+
+def _allocate_pool(pool_surplus, deficit):
+    # proportional allocation of pool_surplus (rows) over deficit (rows x villages), in village order
+    active, dtot, before, full, factor = _pool_terms(pool_surplus, deficit.sum(axis=1), deficit)
+    if not active.any():
+        return np.zeros_like(deficit)
+    return _receive(pool_surplus, deficit, active, dtot, before, full, _exclusive_cumprod(factor),
+                    _first_partial(full, before))
+
+def local_fleet_arrays(demand, solar, battery_kwh=100, battery_pmax_kw=50, min_soc_frac=0.2,
+                       critical_fraction=0.25, dt_hours=1.0):
+    """Per-village dispatch of a villages x timesteps block as rounded timesteps x villages
+    schedule columns (the values simulate_multi_village shares on)."""
+    res = dispatch_arrays(demand, solar, battery_kwh=battery_kwh, battery_pmax_kw=battery_pmax_kw,
+                          min_soc_frac=min_soc_frac, dt_hours=dt_hours,
+                          critical_fraction=critical_fraction)
+    cols = {'demand': res['demand'].T, 'solar': res['solar'].T,
+            'battery_soc': np.round(res['battery_soc'].T, 4)}
+    for c in SCHEDULE_COLUMNS[4:]:
+        cols[c] = np.round(res[c].T, 3)
+    return cols
+
+def simulate_fleet_arrays(demand, solar, battery_kwh=100, battery_pmax_kw=50, min_soc_frac=0.2,
+                          critical_fraction=0.25, dt_hours=1.0):
+    """Dispatch and share a villages x timesteps block; returns timesteps x villages arrays."""
+    cols = local_fleet_arrays(demand, solar, battery_kwh=battery_kwh, battery_pmax_kw=battery_pmax_kw,
+                              min_soc_frac=min_soc_frac, critical_fraction=critical_fraction,
+                              dt_hours=dt_hours)
+    cols.update(share_pool_arrays(cols['solar'], cols['demand'], cols['battery_soc'],
+                                  cols['net_import_kw']))
+    return cols
+
+def _stack_forecasts(forecasts):
+    frames = [forecasts[v].reset_index(drop=True) for v in forecasts]
+    demand = np.vstack([f['demand'].to_numpy(dtype=float) for f in frames])
+    solar = np.vstack([f['solar'].to_numpy(dtype=float) if 'solar' in f.columns
+                       else np.zeros(len(f)) for f in frames])
+    return frames, demand, solar
+
+def simulate_multi_village_vectorized(forecasts, battery_kwh=100, battery_pmax_kw=50, min_soc_frac=0.2,
+                                      critical_fraction=0.25, dt_hours=1.0):
+    """simulate_multi_village on the array dispatch engine and the matrix sharing kernel."""
+    villages = list(forecasts.keys())
+    frames, demand, solar = _stack_forecasts(forecasts)
+    cols = simulate_fleet_arrays(demand, solar, battery_kwh=battery_kwh,
+                                 battery_pmax_kw=battery_pmax_kw, min_soc_frac=min_soc_frac,
+                                 critical_fraction=critical_fraction, dt_hours=dt_hours)
+    final_dfs = {}
+    for i, v in enumerate(villages):
+        df = pd.DataFrame({'timestamp': frames[i]['timestamp']})
+        for c, arr in cols.items():
+            df[c] = arr[:, i]
+        final_dfs[v] = df
+    return final_dfs
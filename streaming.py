@@ -0,0 +1,96 @@
+# streaming.py
+import numpy as np
+from optimizer import _dispatch_step
+from simulator import SOC_SHARE_THRESHOLD, _allocate_pool
+
+class FleetSimulator:
+    """Stateful fleet simulator that advances one telemetry tick at a time.
+
+    Holds SOC for every village plus running pool totals in flat arrays and applies
+    the optimize_storage dispatch rules and the simulate_multi_village sharing rule to
+    a single timestep per step() call, so each tick costs O(villages). Feeding the
+    same readings tick by tick reproduces simulate_multi_village_vectorized.
+    """
+
+    def __init__(self, villages, battery_kwh=100, battery_pmax_kw=50, min_soc_frac=0.2,
+                 critical_fraction=0.25, dt_hours=1.0, initial_soc=0.6):
+        self.villages = [str(v) for v in villages]
+        self._pos = {v: i for i, v in enumerate(self.villages)}
+        n = len(self.villages)
+        self.cap = np.broadcast_to(np.asarray(battery_kwh, dtype=float), (n,)).copy()
+        self.pmax = np.broadcast_to(np.asarray(battery_pmax_kw, dtype=float), (n,)).copy()
+        self.min_soc = np.broadcast_to(np.asarray(min_soc_frac, dtype=float), (n,)).copy()
+        self.critical_fraction = np.broadcast_to(np.asarray(critical_fraction, dtype=float), (n,)).copy()
+        self.inv_cap = np.divide(1.0, self.cap, out=np.zeros(n), where=self.cap > 0)
+        self.dt_hours = float(dt_hours)
+        self.soc = np.broadcast_to(np.asarray(initial_soc, dtype=float), (n,)).copy()
+        self.ticks = 0
+        self.timestamp = None
+        self.imported_kwh = np.zeros(n)
+        self.received_kwh = np.zeros(n)
+
+    def _readings(self, readings):
+        # accepts (demand, solar) arrays in village order, a {village: {'demand', 'solar'}}
+        # mapping, or a frame with village/demand/solar columns
+        if isinstance(readings, tuple):
+            demand, solar = readings
+            return np.asarray(demand, dtype=float), np.asarray(solar, dtype=float)
+        n = len(self.villages)
+        demand, solar = np.zeros(n), np.zeros(n)
+        if hasattr(readings, 'itertuples'):
+            idx = np.array([self._pos[str(v)] for v in readings['village']])
+            demand[idx] = readings['demand'].to_numpy(dtype=float)
+            solar[idx] = readings['solar'].to_numpy(dtype=float) if 'solar' in readings else 0.0
+            if len(idx) != n:
+                raise KeyError(f"readings cover {len(idx)} of {n} villages")
+            return demand, solar
+        for v, r in readings.items():
+            i = self._pos[str(v)]
+            demand[i] = r['demand']
+            solar[i] = r.get('solar', 0.0)
+        if len(readings) != n:
+            raise KeyError(f"readings cover {len(readings)} of {n} villages")
+        return demand, solar
+
+    def step(self, readings, timestamp=None):
+        """Advance one timestep; returns a dict of per-village arrays with the schedule and sharing columns."""
+        demand, solar = self._readings(readings)
+        used_solar, charge_kw, discharge_kw, net_import = _dispatch_step(
+            demand, solar, self.soc, self.cap, self.inv_cap, self.pmax, self.min_soc, self.dt_hours)
+        served_critical = np.minimum(demand * self.critical_fraction, used_solar + discharge_kw)
+        out = {
+            'demand': demand,
+            'solar': solar,
+            'battery_soc': np.round(self.soc, 4),
+            'charge_kw': np.round(charge_kw, 3),
+            'discharge_kw': np.round(discharge_kw, 3),
+            'net_import_kw': np.round(net_import, 3),
+            'served_critical_kw': np.round(served_critical, 3),
+            'served_noncritical_kw': np.round(np.maximum(0.0, demand - served_critical - net_import), 3),
+        }
+        # pool sharing on the rounded values, as in simulate_multi_village
+        surplus = np.maximum(0.0, solar - demand)
+        deficit = np.maximum(0.0, out['net_import_kw'])
+        gated = np.where(out['battery_soc'] >= SOC_SHARE_THRESHOLD, surplus, 0.0)
+        received = _allocate_pool(np.array([gated.sum()]), deficit[None, :])[0]
+        out['surplus'] = surplus
+        out['deficit'] = deficit
+        out['received_from_pool'] = received
+        out['net_import_after_share'] = out['net_import_kw'] - received
+        self.imported_kwh += out['net_import_after_share'] * self.dt_hours
+        self.received_kwh += received * self.dt_hours
+        self.ticks += 1
+        self.timestamp = timestamp
+        return out
+
+    def snapshot(self):
+        """Copy of the mutable state, for what-if branching with restore()."""
+        return {'soc': self.soc.copy(), 'ticks': self.ticks, 'timestamp': self.timestamp,
+                'imported_kwh': self.imported_kwh.copy(), 'received_kwh': self.received_kwh.copy()}
+
+    def restore(self, snap):
+        self.soc = snap['soc'].copy()
+        self.ticks = snap['ticks']
+        self.timestamp = snap['timestamp']
+        self.imported_kwh = snap['imported_kwh'].copy()
+        self.received_kwh = snap['received_kwh'].copy()
@@ -0,0 +1,23 @@
+# tests/conftest.py
+import numpy as np
+import pytest
+from benchmarks.synthetic import fleet_arrays
+
+# 8 villages: village 0 exports 30 kW, villages 1-7 need 26 kW between them. The pool
+# covers villages 1 and 2 in full; village 3 is the first served only in part, and the
+# partial allocation runs on through villages 4-7 (shards [0,2) [2,4) [4,6) [6,8) with 4 workers)
+POOL_ROW = [(5.0, 35.0), (3.0, 0.0), (3.0, 0.0), (8.0, 0.0), (2.0, 0.0), (5.0, 0.0), (1.0, 0.0), (4.0, 0.0)]
+POOL_STEPS = range(0, 30, 5)  # POOL_ROW at t and t + 1; at t + 1 the batteries are settled
+
+@pytest.fixture
+def boundary_fleet():
+    """(demand, solar, battery params, pool steps): villages x timesteps arrays that, with
+    1 kWh batteries, share exactly as described above at step t + 1 of every pool step;
+    other steps come from fleet_arrays."""
+    n_steps = 30
+    demand, solar = (a.T.astype(float) for a in fleet_arrays(len(POOL_ROW), n_steps, seed=4))
+    row_d = np.array([d for d, _ in POOL_ROW])
+    row_s = np.array([s for _, s in POOL_ROW])
+    for t in POOL_STEPS:
+        demand[:, t:t + 2], solar[:, t:t + 2] = row_d[:, None], row_s[:, None]
+    return demand, solar, dict(battery_kwh=1, battery_pmax_kw=100), POOL_STEPS
@@ -0,0 +1,52 @@
+# tests/test_compact_forest.py
+import numpy as np
+import pytest
+from benchmarks.synthetic import fleet_frame
+from compact_forest import CompactForest, CompactModelStore, export_models, forest_stack
+from forecast import FEATURES, MIN_TRAIN_ROWS, _make_features, fit_village
+
+@pytest.fixture(scope="module")
+def models():
+    df = fleet_frame(3, 24 * 10, seed=5)
+    out = {v: fit_village(g, n_jobs=1) for v, g in df.groupby('village')}
+    # too little history: only the mean fallback, no forests
+    out['short'] = fit_village(df[df['village'] == '0'].head(MIN_TRAIN_ROWS - 1).assign(village='short'))
+    return out
+
+@pytest.fixture(scope="module")
+def X():
+    df = fleet_frame(1, 24 * 3, seed=6, start="2025-12-01")
+    return _make_features(df)[FEATURES].fillna(0)
+
+@pytest.mark.parametrize("kind", ['demand', 'solar'])
+def test_compact_matches_sklearn(models, X, kind):
+    for v in ('0', '1', '2'):
+        forest = models[v][kind]
+        np.testing.assert_allclose(CompactForest.from_sklearn(forest).predict(X), forest.predict(X),
+                                   rtol=1e-12, atol=1e-9)
+
+@pytest.mark.parametrize("mmap", [True, False])
+def test_exported_store_matches_sklearn(models, X, tmp_path, mmap):
+    export_models(models, str(tmp_path))
+    store = CompactModelStore(str(tmp_path), mmap=mmap)
+    assert sorted(store) == sorted(str(v) for v in models)
+    for v in ('0', '1', '2'):
+        for kind in ('demand', 'solar'):
+            loaded = store[v][kind]
+            assert isinstance(loaded.value, np.memmap) == mmap
+            np.testing.assert_allclose(loaded.predict(X), models[v][kind].predict(X), rtol=1e-12, atol=1e-9)
+        assert store[v]['mean_demand'] == models[v]['mean_demand']
+    short = store['short']
+    assert short['demand'] is None and short['solar'] is None
+    assert short['mean_demand'] == pytest.approx(models['short']['mean_demand'])
+    assert short['mean_solar'] == pytest.approx(models['short']['mean_solar'])
+
+def test_forest_stack_tracks_replaced_forests(models, X):
+    fleet = {v: dict(models[v]) for v in ('0', '1')}
+    first = forest_stack(fleet, 'demand')
+    assert forest_stack(fleet, 'demand') is first
+    fleet['1']['demand'] = models['2']['demand']  # replaced in place
+    stack = forest_stack(fleet, 'demand')
+    assert stack is not first
+    np.testing.assert_allclose(stack.predict(X, np.full(len(X), stack.index['1'])),
+                               models['2']['demand'].predict(X), rtol=1e-12, atol=1e-9)
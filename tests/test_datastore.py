@@ -0,0 +1,49 @@
+# tests/test_datastore.py
+import numpy as np
+import pandas as pd
+import pytest
+from pandas.testing import assert_frame_equal
+from benchmarks.synthetic import fleet_frame, write_plant_csvs
+from datastore import load_fleet_arrays, load_store, load_village_frames, write_store
+from merge_dataset import stream_merge
+from optimizer import dispatch_arrays
+
+def test_stream_merge_twice_is_idempotent(tmp_path):
+    gen, weather = write_plant_csvs(str(tmp_path), 10, inverters=3)
+    root = str(tmp_path / "store")
+    rows = stream_merge(gen, weather, root, chunksize=997)
+    once = load_store(root)
+    assert len(once) == rows
+    stream_merge(gen, weather, root, chunksize=997)
+    assert_frame_equal(load_store(root), once)
+    assert len(load_village_frames(root)['1']) == rows
+
+def test_rewrite_keeps_latest_reading(tmp_path):
+    root = str(tmp_path)
+    df = fleet_frame(2, 48)
+    write_store(df, root)
+    write_store(df.iloc[:5].assign(demand=-1.0), root)
+    got = load_store(root)
+    assert len(got) == len(df)
+    assert (got['demand'] == -1.0).sum() == 5
+
+def test_write_store_rejects_duplicate_keys(tmp_path):
+    df = fleet_frame(1, 4)
+    with pytest.raises(ValueError, match="duplicate"):
+        write_store(pd.concat([df, df.iloc[:1]]), str(tmp_path))
+
+def test_fleet_arrays_have_no_gaps_for_dispatch(tmp_path):
+    df = fleet_frame(2, 48)
+    write_store(df.drop(index=[0, 10]).assign(solar=lambda d: d['solar'].where(d.index != 20)), str(tmp_path))
+    timestamps, villages, demand, solar = load_fleet_arrays(str(tmp_path))
+    assert demand.shape == solar.shape == (2, 48)
+    assert demand[0, 0] == demand[0, 1] and demand[0, 10] == demand[0, 9]
+    assert solar[0, 20] == solar[0, 19]
+    res = dispatch_arrays(demand, solar)
+    assert not np.isnan(res['battery_soc']).any()
+
+def test_fleet_arrays_reject_village_without_demand(tmp_path):
+    df = fleet_frame(2, 6)
+    write_store(df.assign(demand=df['demand'].where(df['village'] != '1')), str(tmp_path))
+    with pytest.raises(ValueError, match="no demand"):
+        load_fleet_arrays(str(tmp_path))
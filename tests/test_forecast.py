@@ -0,0 +1,20 @@
+# tests/test_forecast.py
+import pytest
+from benchmarks.synthetic import fleet_frame
+from forecast import fit_global, fit_village, forecast_horizon_global, forecast_horizon_recursive
+
+@pytest.fixture(scope="module")
+def history():
+    # ten days ending at 23:00, so the horizon starts in the dark
+    return fleet_frame(4, 24 * 10, seed=2)
+
+def test_global_seeds_unknown_village_from_fleet_level(history):
+    model = fit_global(history, n_jobs=1)
+    out = forecast_horizon_global(history, model, ['0', 'zz'], 3)
+    assert out['zz']['timestamp'].iloc[0].hour == 0
+    assert out['zz']['solar'].iloc[0] == pytest.approx(out['0']['solar'].iloc[0], abs=0.5)
+
+def test_recursive_seeds_village_without_history(history):
+    models = {v: fit_village(g, n_jobs=1) for v, g in history.groupby('village')}
+    out = forecast_horizon_recursive(history[history['village'] != '3'], models, ['0', '3'], 3)
+    assert out['3']['solar'].iloc[0] == pytest.approx(out['0']['solar'].iloc[0], abs=0.5)
@@ -0,0 +1,17 @@
+# tests/test_merge_dataset.py
+import numpy as np
+import pandas as pd
+from benchmarks.synthetic import write_plant_csvs
+from datastore import load_store
+from merge_dataset import merge_plant, stream_merge
+
+def test_stream_merge_matches_merge_plant(tmp_path):
+    # 3 inverters and a chunk size that is not a multiple of 3 split timestamps across chunks
+    gen, weather = write_plant_csvs(str(tmp_path), 12, inverters=3)
+    full = pd.read_csv(merge_plant(gen, weather, str(tmp_path / "merged.csv")), parse_dates=["Timestamp"])
+    rows = stream_merge(gen, weather, str(tmp_path / "store"), chunksize=997)
+    store = load_store(str(tmp_path / "store"))
+    assert rows == len(store) == len(full) == pd.read_csv(gen)['DATE_TIME'].nunique()
+    assert (store['timestamp'].to_numpy() == full['Timestamp'].to_numpy()).all()
+    for col, name in (('solar', "Solar (kW)"), ('wind', "Wind (kW)"), ('demand', "Demand (kW)")):
+        np.testing.assert_allclose(store[col], full[name].astype(np.float32), rtol=1e-6)
@@ -0,0 +1,39 @@
+# tests/test_optimizer.py
+import pytest
+from pandas.testing import assert_frame_equal
+from benchmarks.synthetic import fleet_forecasts
+from optimizer import (optimize_fleet, optimize_fleet_mpc, optimize_storage, optimize_storage_mpc,
+                       optimize_storage_vectorized)
+
+CASES = {
+    'default': {},
+    'no battery': dict(battery_kwh=0),
+    'quarter hour': dict(dt_hours=0.25),
+    'min soc above start': dict(min_soc_frac=0.7),
+}
+
+@pytest.fixture(scope="module")
+def forecasts():
+    # three days, so the battery both fills and runs down to its floor
+    return fleet_forecasts(4, 72, seed=1)
+
+@pytest.mark.parametrize("params", CASES.values(), ids=CASES.keys())
+def test_vectorized_matches_loop(forecasts, params):
+    for fc in forecasts.values():
+        assert_frame_equal(optimize_storage_vectorized(fc, **params), optimize_storage(fc, **params))
+
+@pytest.mark.parametrize("params", CASES.values(), ids=CASES.keys())
+def test_fleet_matches_loop(forecasts, params):
+    fleet = optimize_fleet(forecasts, **params)
+    assert list(fleet) == list(forecasts)
+    for v, fc in forecasts.items():
+        assert_frame_equal(fleet[v], optimize_storage(fc, **params))
+
+def test_fleet_mpc_matches_per_village_cost(forecasts):
+    # block-diagonal LPs may break ties differently, but each village's cost must match
+    def cost(s, fc):
+        unserved = (fc['demand'] * 0.25 - s['served_critical_kw']).clip(lower=0)
+        return s['net_import_kw'].sum() + 10 * unserved.sum()
+    fleet = optimize_fleet_mpc(forecasts, commit_steps=1, villages_per_lp=3)
+    for v, fc in forecasts.items():
+        assert cost(fleet[v], fc) == pytest.approx(cost(optimize_storage_mpc(fc), fc), abs=0.05)
@@ -0,0 +1,62 @@
+# tests/test_simulator.py
+import pandas as pd
+import pytest
+from pandas.testing import assert_frame_equal
+from benchmarks.synthetic import fleet_forecasts
+from simulator import simulate_multi_village, simulate_multi_village_vectorized
+
+# a 1 kWh battery is full after one sunny step and empty after one dark one, so from
+# step 1 on an exporter's surplus is solar - demand and a village's deficit its demand
+BATTERY = dict(battery_kwh=1, battery_pmax_kw=100)
+
+def _forecasts(rows):
+    """rows: per step, {village: (demand, solar)}; step 0 charges/drains the batteries."""
+    villages = list(rows[0])
+    ts = pd.date_range("2025-06-01", periods=len(rows) + 1, freq="h")
+    warmup = {v: (5.0, 10.0 if rows[0][v][1] > rows[0][v][0] else 0.0) for v in villages}
+    steps = [warmup] + rows
+    return {v: pd.DataFrame({'timestamp': ts, 'village': v,
+                             'demand': [s[v][0] for s in steps], 'solar': [s[v][1] for s in steps]})
+            for v in villages}
+
+EDGE_CASES = {
+    # pool (10) exactly equals the total deficit (4 + 6)
+    'pool equals deficit': [{'a': (5.0, 15.0), 'b': (4.0, 0.0), 'c': (6.0, 0.0), 'd': (3.0, 3.0)}],
+    # villages without deficit ahead of the first one the pool only partly serves
+    'zero deficit first': [{'a': (5.0, 10.0), 'b': (2.0, 2.0), 'c': (7.0, 7.0), 'd': (8.0, 0.0),
+                            'e': (4.0, 0.0)}],
+    # deficits but nobody exporting: the exporter's solar only matches its demand
+    'no exporters': [{'a': (5.0, 5.0), 'b': (4.0, 0.0), 'c': (6.0, 0.0)}],
+    # pool larger than every need, then the same fleet with several steps mixed
+    'pool exceeds deficit': [{'a': (1.0, 30.0), 'b': (4.0, 0.0), 'c': (6.0, 0.0)}],
+    'mixed steps': [{'a': (5.0, 15.0), 'b': (4.0, 0.0), 'c': (6.0, 0.0)},
+                    {'a': (5.0, 5.0), 'b': (4.0, 0.0), 'c': (6.0, 0.0)},
+                    {'a': (5.0, 9.0), 'b': (0.0, 0.0), 'c': (6.0, 0.0)},
+                    {'a': (5.0, 25.0), 'b': (3.0, 0.0), 'c': (6.0, 0.0)}],
+}
+
+def _assert_same(forecasts, **params):
+    loop = simulate_multi_village(forecasts, **params)
+    vec = simulate_multi_village_vectorized(forecasts, **params)
+    assert list(vec) == list(loop)
+    for v in loop:
+        assert_frame_equal(vec[v], loop[v])
+    return loop
+
+@pytest.mark.parametrize("rows", EDGE_CASES.values(), ids=EDGE_CASES.keys())
+def test_vectorized_matches_loop_on_edge_cases(rows):
+    _assert_same(_forecasts(rows), **BATTERY)
+
+def test_edge_cases_exercise_the_pool():
+    loop = _assert_same(_forecasts(EDGE_CASES['pool equals deficit']), **BATTERY)
+    # the loop hands b its full need and c a share of what is left
+    assert loop['b']['received_from_pool'].iloc[1] == 4.0
+    assert loop['c']['received_from_pool'].iloc[1] == pytest.approx(3.6)
+    loop = _assert_same(_forecasts(EDGE_CASES['zero deficit first']), **BATTERY)
+    assert loop['c']['received_from_pool'].iloc[1] == 0.0
+    assert 0 < loop['d']['received_from_pool'].iloc[1] < 8.0
+    loop = _assert_same(_forecasts(EDGE_CASES['no exporters']), **BATTERY)
+    assert loop['b']['received_from_pool'].iloc[1] == 0.0
+
+def test_vectorized_matches_loop_on_fleet():
+    _assert_same(fleet_forecasts(12, 72, seed=3))
@@ -0,0 +1,25 @@
+# tests/test_streaming.py
+import numpy as np
+from simulator import simulate_fleet_arrays
+from streaming import FleetSimulator
+
+def test_tick_replay_matches_batch_run(boundary_fleet):
+    demand, solar, battery, pool_steps = boundary_fleet
+    ref = simulate_fleet_arrays(demand, solar, **battery)
+    sim = FleetSimulator(range(len(demand)), **battery)
+    ticks = [sim.step((demand[:, t], solar[:, t])) for t in range(demand.shape[1])]
+    for key in ref:
+        np.testing.assert_array_equal(np.stack([tick[key] for tick in ticks]), ref[key], err_msg=key)
+    assert sim.ticks == demand.shape[1]
+    np.testing.assert_allclose(sim.received_kwh, ref['received_from_pool'].sum(axis=0))
+
+def test_snapshot_restore_replays_the_same_ticks(boundary_fleet):
+    demand, solar, battery, pool_steps = boundary_fleet
+    sim = FleetSimulator(range(len(demand)), **battery)
+    for t in range(10):
+        sim.step((demand[:, t], solar[:, t]))
+    snap = sim.snapshot()
+    first = [sim.step((demand[:, t], solar[:, t]))['net_import_after_share'] for t in range(10, 20)]
+    sim.restore(snap)
+    again = [sim.step((demand[:, t], solar[:, t]))['net_import_after_share'] for t in range(10, 20)]
+    np.testing.assert_array_equal(np.stack(first), np.stack(again))
@@ -0,0 +1,93 @@
+# tests/test_weather_ingest.py
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
+import numpy as np
+import pandas as pd
+import pytest
+from aiohttp import web
+from benchmarks.stub_power import start_stub_server, stub_payload
+from power_api import PowerCache, make_query, query_key
+from weather_ingest import SiteFetchError, fetch_sites_async, ingest_sites
+
+START, END = "20250101", "20250107"
+SITES = pd.DataFrame({"village": ["a", "b", "c"], "lat": [8.0, 8.1, 8.2], "lon": [76.0, 76.0, 76.0]})
+
+@pytest.fixture
+def stub():
+    """start(respond) -> url; every server started is stopped after the test."""
+    stops = []
+
+    def start(respond=None, fail_every=0):
+        url, stop = start_stub_server(latency=0.0, fail_every=fail_every, respond=respond)
+        stops.append(stop)
+        return url
+    yield start
+    for stop in stops:
+        stop()
+
+def _cache_key(site):
+    return query_key(make_query(site.lat, site.lon, START, END))
+
+def test_frame_columns_and_fill_values(stub):
+    def respond(q, n):
+        if q["latitude"] == "8.1":
+            payload = stub_payload(q["start"], q["end"])
+            payload["properties"]["parameter"]["ALLSKY_SFC_SW_DWN"]["20250103"] = -999.0
+            payload["properties"]["parameter"]["WS10M"]["20250105"] = -999.0
+            return web.json_response(payload)
+    frame = ingest_sites(SITES, START, END, url=stub(respond))
+    assert list(frame.columns) == ["timestamp", "village", "solar", "wind"]
+    assert frame.shape == (3 * 7, 4)
+    assert frame.groupby("village").size().to_dict() == {"a": 7, "b": 7, "c": 7}
+    b = frame[frame["village"] == "b"].set_index("timestamp")
+    assert np.isnan(b.loc["2025-01-03", "solar"]) and np.isnan(b.loc["2025-01-05", "wind"])
+    assert frame["solar"].isna().sum() == 1 and frame["wind"].isna().sum() == 1
+
+def test_retries_503_then_succeeds(stub):
+    seen = {}
+
+    def respond(q, n):
+        seen[q["latitude"]] = seen.get(q["latitude"], 0) + 1
+        if q["latitude"] == "8.2" and seen["8.2"] == 1:
+            return web.Response(status=503)
+    payloads = asyncio.run(fetch_sites_async(SITES, START, END, url=stub(respond), backoff=0.01))
+    assert set(payloads) == {"a", "b", "c"}
+    assert seen == {"8.0": 1, "8.1": 1, "8.2": 2}
+
+def test_fills_cache_and_serves_from_it(stub, tmp_path):
+    cache = PowerCache(directory=str(tmp_path))
+    first = asyncio.run(fetch_sites_async(SITES, START, END, url=stub(), cache=cache))
+    for site in SITES.itertuples(index=False):
+        assert cache.get(_cache_key(site)) == first[site.village]
+    # every request to this server fails, so the second pass can only come from the cache
+    fresh = PowerCache(directory=str(tmp_path))
+    again = asyncio.run(fetch_sites_async(SITES, START, END, url=stub(fail_every=1), cache=fresh,
+                                          retries=0))
+    assert again == first
+
+def test_client_error_keeps_other_sites(stub, tmp_path):
+    def respond(q, n):
+        if q["latitude"] == "8.1":
+            return web.Response(status=404)
+    url = stub(respond)
+    cache = PowerCache(directory=str(tmp_path))
+    with pytest.raises(SiteFetchError) as info:
+        asyncio.run(fetch_sites_async(SITES, START, END, url=url, cache=cache))
+    assert set(info.value.failures) == {"b"}
+    assert set(info.value.payloads) == {"a", "c"}
+    for site in SITES.itertuples(index=False):
+        assert (cache.get(_cache_key(site)) is None) == (site.village == "b")
+    skipped = asyncio.run(fetch_sites_async(SITES, START, END, url=url, errors="skip"))
+    assert set(skipped) == {"a", "c"}
+
+def test_cache_is_thread_safe(tmp_path):
+    cache = PowerCache(directory=str(tmp_path), ttl_seconds=0.001, max_disk_entries=4, max_memory_entries=2)
+
+    def hammer(seed):
+        for i in range(300):
+            key = f"k{(seed + i) % 6}"
+            if cache.get(key) is None:
+                cache.put(key, {"i": i})
+    with ThreadPoolExecutor(8) as pool:
+        list(pool.map(hammer, range(8)))  # re-raises any KeyError / FileNotFoundError
+    assert len(cache._memory) <= 2
@@ -1,18 +1,119 @@
 # visualization.py
+import numpy as np
 import plotly.graph_objects as go
 import pandas as pd
 
-def plot_village_timeseries(df_schedule, title="Energy flows"):
-    df = df_schedule.copy()
-    x = df['timestamp'] if 'timestamp' in df.columns else list(range(len(df)))
+MAX_POINTS = 2000         # per trace after downsampling, roughly the pixel width of a chart
+WEBGL_MIN_POINTS = 5000   # longer traces are drawn with Scattergl instead of SVG
+
+def minmax_indices(y, n_out):
+    """Indices keeping the min and max of each of ~n_out/2 equal buckets, plus both ends.
+
+    Peaks and troughs survive (unlike striding), and every bucket is reduced at once.
+    """
+    y = np.asarray(y, dtype=float)
+    n = len(y)
+    if n <= max(n_out, 3):
+        return np.arange(n)
+    inner = n - 2
+    size = -(-inner // max(1, (n_out - 2) // 2))
+    n_buckets = -(-inner // size)
+    vals = np.full(n_buckets * size, np.nan)
+    vals[:inner] = y[1:-1]
+    vals = vals.reshape(n_buckets, size)
+    start = 1 + np.arange(n_buckets) * size
+    lo = start + np.argmin(np.where(np.isnan(vals), np.inf, vals), axis=1)
+    hi = start + np.argmax(np.where(np.isnan(vals), -np.inf, vals), axis=1)
+    return np.unique(np.concatenate([[0], lo, hi, [n - 1]]))
+
+def lttb_indices(x, y, n_out):
+    """Largest-Triangle-Three-Buckets selection of n_out points (x numeric, ascending)."""
+    x = np.asarray(x, dtype=float)
+    y = np.asarray(y, dtype=float)
+    n = len(y)
+    if n <= max(n_out, 3):
+        return np.arange(n)
+    # n_out - 2 buckets over the interior points; the last point closes the final bucket
+    edges = np.append(np.linspace(1, n - 1, n_out - 1).astype(int), n)
+    keep = np.empty(n_out, dtype=int)
+    keep[0], keep[-1] = 0, n - 1
+    a = 0
+    for i in range(n_out - 2):
+        lo, hi = edges[i], edges[i + 1]
+        cx = x[hi:edges[i + 2]].mean()
+        cy = y[hi:edges[i + 2]].mean()
+        area = np.abs((x[a] - cx) * (y[lo:hi] - y[a]) - (x[a] - x[lo:hi]) * (cy - y[a]))
+        a = lo + int(np.argmax(np.nan_to_num(area, nan=-1.0)))
+        keep[i + 1] = a
+    return keep
+
+def downsample(x, y, max_points=MAX_POINTS, method="minmax"):
+    """Shape-preserving subset of one series; `method` is "minmax" or "lttb"."""
+    y = np.asarray(y)
+    if max_points is None or len(y) <= max_points:
+        return x, y
+    if method == "lttb":
+        xn = pd.to_numeric(pd.Series(x)).to_numpy(dtype=float)
+        idx = lttb_indices(xn, y, max_points)
+    else:
+        idx = minmax_indices(y, max_points)
+    return np.asarray(x)[idx], y[idx]
+
+def _in_range(x, x_range):
+    # visible window plus one point either side so lines run to the plot edges
+    x = pd.Series(x)
+    lo, hi = (pd.Timestamp(v) if pd.api.types.is_datetime64_any_dtype(x) else v for v in x_range)
+    inside = ((x >= lo) & (x <= hi)).to_numpy()
+    pad = inside.copy()
+    pad[1:] |= inside[:-1]
+    pad[:-1] |= inside[1:]
+    return pad
+
+def _line(x, y, name, webgl, **kwargs):
+    trace = go.Scattergl if webgl else go.Scatter
+    return trace(x=x, y=y, mode='lines', name=name, **kwargs)
+
+def plot_village_timeseries(df_schedule, title="Energy flows", max_points=MAX_POINTS, x_range=None,
+                            method="minmax", webgl=None):
+    """Demand/solar/(wind)/SOC chart. Series longer than `max_points` are downsampled to
+    the visible `x_range` and drawn with WebGL; short schedules plot exactly as before."""
+    df = df_schedule
+    x = df['timestamp'] if 'timestamp' in df.columns else pd.Series(range(len(df)))
+    if x_range is not None:
+        keep = _in_range(x, x_range)
+        df, x = df[keep], x[keep]
+    if webgl is None:
+        webgl = len(df) > WEBGL_MIN_POINTS
     fig = go.Figure()
-    fig.add_trace(go.Scatter(x=x, y=df['demand'], mode='lines', name='Demand'))
-    fig.add_trace(go.Scatter(x=x, y=df['solar'], mode='lines', name='Solar'))
+    series = [('demand', 'Demand', {}), ('solar', 'Solar', {})]
     if 'wind' in df.columns:
-        fig.add_trace(go.Scatter(x=x, y=df['wind'], mode='lines', name='Wind'))
-    fig.add_trace(go.Scatter(x=x, y=df['battery_soc'], mode='lines', name='Battery SOC', yaxis='y2'))
+        series.append(('wind', 'Wind', {}))
+    series.append(('battery_soc', 'Battery SOC', {'yaxis': 'y2'}))
+    for col, name, kwargs in series:
+        xs, ys = downsample(x, df[col], max_points, method)
+        fig.add_trace(_line(xs, ys, name, webgl, **kwargs))
     fig.update_layout(title=title,
                       xaxis_title='Time',
                       yaxis_title='kW',
                       yaxis2=dict(title='SOC (fraction)', overlaying='y', side='right', range=[0,1]))
     return fig
+
+def plot_fleet_timeseries(frames, column='demand', title=None, max_points=MAX_POINTS, x_range=None,
+                          method="minmax", webgl=None):
+    """One line per village for `column`; `frames` is {village: frame} or a long frame with a
+    village column. Each line is downsampled independently."""
+    if isinstance(frames, pd.DataFrame):
+        frames = {v: g for v, g in frames.groupby('village', observed=True, sort=False)}
+    total = sum(len(f) for f in frames.values())
+    if webgl is None:
+        webgl = total > WEBGL_MIN_POINTS
+    fig = go.Figure()
+    for v, f in frames.items():
+        x = f['timestamp']
+        if x_range is not None:
+            keep = _in_range(x, x_range)
+            f, x = f[keep], x[keep]
+        xs, ys = downsample(x, f[column], max_points, method)
+        fig.add_trace(_line(xs, ys, f"Village {v}", webgl))
+    fig.update_layout(title=title or column, xaxis_title='Time', yaxis_title=column)
+    return fig
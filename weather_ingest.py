@@ -0,0 +1,113 @@
+# weather_ingest.py
+import asyncio
+import random
+import aiohttp
+import numpy as np
+import pandas as pd
+from power_api import POWER_DAILY_URL, DEFAULT_PARAMETERS, make_query, query_key
+
+POWER_FILL_VALUE = -999.0
+RETRY_STATUSES = {429, 500, 502, 503, 504}
+
+class SiteFetchError(RuntimeError):
+    """Some sites failed; `failures` is {village: exception}, `payloads` the sites that worked."""
+
+    def __init__(self, failures, payloads):
+        self.failures = failures
+        self.payloads = payloads
+        shown = ", ".join(f"{vid}: {exc!r}" for vid, exc in list(failures.items())[:5])
+        super().__init__(f"{len(failures)} of {len(failures) + len(payloads)} sites failed ({shown})")
+
+async def _fetch_one(session, sem, url, query, retries, backoff):
+    params = dict(query, format="JSON")
+    for attempt in range(retries + 1):
+        async with sem:
+            try:
+                async with session.get(url, params=params) as resp:
+                    if resp.status not in RETRY_STATUSES:
+                        resp.raise_for_status()
+                        return await resp.json(content_type=None)
+                    error = aiohttp.ClientResponseError(resp.request_info, resp.history,
+                                                        status=resp.status, message=resp.reason)
+            except (aiohttp.ClientConnectionError, asyncio.TimeoutError) as exc:
+                error = exc
+        if attempt == retries:
+            raise error
+        # exponential backoff with jitter, outside the semaphore so the slot is reused
+        await asyncio.sleep(backoff * (2 ** attempt) * (0.5 + random.random()))
+
+async def fetch_sites_async(sites, start, end, parameters=DEFAULT_PARAMETERS, concurrency=20,
+                            retries=3, backoff=0.5, timeout=60, url=POWER_DAILY_URL, cache=None,
+                            errors="raise"):
+    """Fetch POWER daily data for every site concurrently.
+
+    `sites` is a frame (or list of dicts) with village, lat and lon. At most
+    `concurrency` requests are in flight over one pooled session; 429/5xx responses and
+    connection errors are retried with exponential backoff. An optional power_api
+    PowerCache is consulted first and filled with new responses. A site that still fails
+    does not cancel the others: every successful payload is kept (and cached), then
+    SiteFetchError is raised, or with errors="skip" the failed sites are left out.
+    Returns {village: payload}.
+    """
+    if errors not in ("raise", "skip"):
+        raise ValueError(f"errors must be 'raise' or 'skip', not {errors!r}")
+    sites = pd.DataFrame(sites)
+    queries = {row.village: make_query(row.lat, row.lon, start, end, parameters)
+               for row in sites.itertuples(index=False)}
+    payloads = {}
+    pending = {}
+    for vid, q in queries.items():
+        hit = cache.get(query_key(q)) if cache is not None else None
+        if hit is not None:
+            payloads[vid] = hit
+        else:
+            pending[vid] = q
+    if pending:
+        sem = asyncio.Semaphore(concurrency)
+        connector = aiohttp.TCPConnector(limit=concurrency)
+        client_timeout = aiohttp.ClientTimeout(total=timeout)
+        async with aiohttp.ClientSession(connector=connector, timeout=client_timeout) as session:
+            results = await asyncio.gather(*(_fetch_one(session, sem, url, q, retries, backoff)
+                                             for q in pending.values()), return_exceptions=True)
+        failures = {}
+        for (vid, q), payload in zip(pending.items(), results):
+            if isinstance(payload, Exception):
+                failures[vid] = payload
+                continue
+            payloads[vid] = payload
+            if cache is not None:
+                cache.put(query_key(q), payload)
+        if failures and errors == "raise":
+            raise SiteFetchError(failures, payloads)
+    return payloads
+
+def payloads_to_frame(payloads):
+    """Tidy timestamp/village/solar/wind frame from {village: POWER payload}."""
+    frames = []
+    for vid, data in payloads.items():
+        param = data["properties"]["parameter"]
+        solar = param["ALLSKY_SFC_SW_DWN"]
+        wind = param.get("WS10M", {})
+        frames.append(pd.DataFrame({
+            "timestamp": pd.to_datetime(list(solar.keys()), format="%Y%m%d"),
+            "village": vid,
+            "solar": np.array(list(solar.values()), dtype=float),
+            "wind": np.array([wind.get(k, np.nan) for k in solar.keys()], dtype=float),
+        }))
+    df = pd.concat(frames, ignore_index=True)
+    df[["solar", "wind"]] = df[["solar", "wind"]].replace(POWER_FILL_VALUE, np.nan)
+    return df.sort_values(["village", "timestamp"]).reset_index(drop=True)
+
+def ingest_sites(sites, start, end, demand=None, **kwargs):
+    """Concurrent multi-site ingestion into one village-keyed frame.
+
+    With a `demand` history (timestamp, village, demand) each demand row is joined to
+    that village's most recent daily weather, giving the timestamp/village/demand/solar
+    frame forecast.train_or_load_models expects.
+    """
+    weather = payloads_to_frame(asyncio.run(fetch_sites_async(sites, start, end, **kwargs)))
+    if demand is None:
+        return weather
+    merged = pd.merge_asof(demand.sort_values("timestamp"), weather.sort_values("timestamp"),
+                           on="timestamp", by="village", direction="backward")
+    return merged.sort_values(["village", "timestamp"]).reset_index(drop=True)